@@ -0,0 +1,50 @@
+import secrets
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import PlainTextResponse
+from app.config.config import config
+from app.utils.profiler import ProfilerBusy, profile_process, render_collapsed
+from app.utils.slow_requests import slow_requests
+
+admin_router = APIRouter()
+
+
+async def require_admin(request: Request) -> None:
+    """Allow the request only if it carries ADMIN_API_KEY; admin endpoints do not exist while it is unset."""
+    if not config.ADMIN_API_KEY:
+        raise HTTPException(status_code=404, detail="Not Found")
+    supplied = request.headers.get(config.ADMIN_API_KEY_HEADER, "")
+    if not secrets.compare_digest(supplied.encode(), config.ADMIN_API_KEY.encode()):
+        raise HTTPException(status_code=403, detail="Invalid admin key.")
+
+
+@admin_router.post("/profile", response_class=PlainTextResponse, dependencies=[Depends(require_admin)])
+async def profile(
+    seconds: float = Query(10.0, gt=0, description="How long to sample"),
+    interval_ms: Optional[float] = Query(None, ge=1, description="Sampling interval (default PROFILER_DEFAULT_INTERVAL_MS)"),
+    line_numbers: bool = Query(False, description="Split frames by line instead of by function")
+):
+    """
+    Sample every thread of this worker for `seconds` and return collapsed stacks
+    (`frame;frame count` per line), ready for flamegraph.pl or speedscope.
+    """
+    if seconds > config.PROFILER_MAX_SECONDS:
+        raise HTTPException(status_code=400, detail=f"seconds must be at most {config.PROFILER_MAX_SECONDS:g}.")
+    interval = (interval_ms or config.PROFILER_DEFAULT_INTERVAL_MS) / 1000
+    try:
+        counts = await profile_process(seconds, interval, line_numbers=line_numbers)
+    except ProfilerBusy:
+        raise HTTPException(status_code=409, detail="A profile is already running on this worker.")
+    return render_collapsed(counts)
+
+
+@admin_router.get("/slow-requests", dependencies=[Depends(require_admin)])
+async def get_slow_requests(limit: Optional[int] = Query(None, gt=0)):
+    """Requests slower than SLOW_REQUEST_THRESHOLD_MS on this worker, newest first."""
+    return {"threshold_ms": slow_requests.threshold_ms, "requests": slow_requests.records(limit)}
+
+
+@admin_router.delete("/slow-requests", dependencies=[Depends(require_admin)])
+async def clear_slow_requests():
+    slow_requests.clear()
+    return {"message": "Slow request buffer cleared"}
@@ -1,21 +1,95 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request, Response
 from app.models.models import AnswerPayload, QueryRequest
 from app.src.workflow import process_query
+from app.config.config import config
+from app.utils.admission import AdmissionRejected
+from app.utils.deadlines import ClientDisconnected, DeadlineExceeded, run_with_cancellation
+from app.utils.slow_requests import slow_requests
+from app.utils.timing import record_timing, server_timing_header
 import logging
+import time
+from typing import Optional
 
 logger = logging.getLogger(__name__)
 
 ask_router = APIRouter()
 
+def _request_deadline(request: QueryRequest, http_request: Request) -> Optional[float]:
+    """
+    Absolute deadline from the tightest of the header and body budgets.
+
+    Without either, ADMISSION_DEFAULT_DEADLINE applies if set; otherwise the request has no deadline.
+    """
+    budgets = [] if request.deadline_ms is None else [request.deadline_ms / 1000]
+    header = http_request.headers.get(config.REQUEST_DEADLINE_HEADER)
+    if header:
+        try:
+            budgets.append(float(header) / 1000)
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"Invalid {config.REQUEST_DEADLINE_HEADER} header.")
+    if not budgets and config.ADMISSION_DEFAULT_DEADLINE:
+        budgets.append(config.ADMISSION_DEFAULT_DEADLINE)
+    if not budgets:
+        return None
+    return time.monotonic() + max(0.0, min(budgets))
+
 @ask_router.post("/ask", response_model=AnswerPayload)
-async def ask_question(request: QueryRequest):
+async def ask_question(request: QueryRequest, http_request: Request, response: Response):
     question = request.question
     logger.info(f"Received question: {question}")
     if not question:
         raise HTTPException(status_code=400, detail="Missing 'question' field.")
     
+    if request.search_effort and request.search_effort not in config.SEARCH_EFFORT_PROFILES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown search_effort '{request.search_effort}'. Expected one of: {', '.join(config.SEARCH_EFFORT_PROFILES)}"
+        )
+    
     # Call RAG chain or LLM with the prompt and question
-    result = await process_query(question)
+    trace = {}
+    started = time.perf_counter()
+    deadline = _request_deadline(request, http_request)
+    status_code = 500
+    try:
+        # Cancels the pipeline (Milvus search, vLLM stream) if the client leaves or the budget runs out
+        result = await run_with_cancellation(
+            slow_requests.watched(
+                process_query(
+                    question,
+                    search_effort=request.search_effort,
+                    trace=trace,
+                    priority=request.priority,
+                    deadline=deadline
+                ),
+                trace
+            ),
+            deadline=deadline,
+            is_disconnected=http_request.is_disconnected,
+            poll_interval=config.DISCONNECT_POLL_INTERVAL
+        )
+        status_code = 200
+    except AdmissionRejected as e:
+        status_code = 429
+        raise HTTPException(
+            status_code=429,
+            detail=f"Server is overloaded ({e.stage} {e.reason}); retry later.",
+            headers={"Retry-After": e.retry_after_header}
+        )
+    except DeadlineExceeded:
+        status_code = 504
+        raise HTTPException(status_code=504, detail="Request deadline exceeded.")
+    except ClientDisconnected:
+        status_code = 499
+        logger.info(f"Client disconnected; cancelled question: {question}")
+        # Nobody is listening; 499 (client closed request) keeps access logs honest
+        return Response(status_code=499)
+    finally:
+        record_timing(trace, "total", started)
+        slow_requests.record("/api/ask", status_code, trace, question=question[:200])
+    # Lets clients and dashboards tell fast-path answers from LLM answers
+    response.headers["X-Answer-Path"] = trace.get("answer_path", "llm")
+    response.headers["Server-Timing"] = server_timing_header(trace["timings"])
 
     result = AnswerPayload(
         answer = result.answer,
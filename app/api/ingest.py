@@ -1,11 +1,15 @@
 import logging
-from typing import List, Optional
-from fastapi import APIRouter, UploadFile, File, HTTPException, status
+from typing import Any, Dict, List, Optional
+import time
+from fastapi import APIRouter, UploadFile, File, HTTPException, Response, status
 from langchain_core.documents import Document
 from app.config.config import config
 from app.models.models import IngestResponse
 from app.rag.document_processor import load_and_chunk_document
+from app.rag.category_router import schedule_centroid_build
 from app.utils.milvus_utils import index_document_chunks
+from app.utils.slow_requests import slow_requests
+from app.utils.timing import record_timing, server_timing_header, stage_timer
 
 logger = logging.getLogger(__name__)
 ingest_router = APIRouter()
@@ -15,6 +19,7 @@ ingest_router = APIRouter()
              summary="Upload and index one or multiple documents",
              tags=["Ingestion"])
 async def ingest_documents(
+    response: Response,
     file: List[UploadFile] = File(...)
 ):
     """
@@ -24,6 +29,28 @@ async def ingest_documents(
     if not file:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="No files provided.")
 
+    trace = {}
+    started = time.perf_counter()
+    status_code = 500
+    try:
+        processed_files = await slow_requests.watched(_chunk_and_index(file, trace), trace)
+        status_code = 200
+    except HTTPException as e:
+        status_code = e.status_code
+        raise
+    finally:
+        record_timing(trace, "total", started)
+        slow_requests.record("/ingest", status_code, trace, files=[f.filename for f in file])
+
+    response.headers["Server-Timing"] = server_timing_header(trace["timings"])
+    return IngestResponse(
+        message=f"Successfully processed and indexed {len(processed_files)} files",
+        filename=", ".join(processed_files)
+    )
+
+
+async def _chunk_and_index(file: List[UploadFile], trace: Dict[str, Any]) -> List[str]:
+    """Chunk every uploaded file and index all chunks; returns the processed file names."""
     processed_files = []
     all_documents = []
 
@@ -44,7 +71,8 @@ async def ingest_documents(
                 file_obj.name = current_file.filename
                 
                 # Process the document
-                documents = load_and_chunk_document(file_obj)
+                with stage_timer(trace, "chunking"):
+                    documents = load_and_chunk_document(file_obj)
                 
                 if documents:
                     all_documents.extend(documents)
@@ -68,13 +96,16 @@ async def ingest_documents(
 
         # Index all documents synchronously
         if all_documents:
-            vector_store = await index_document_chunks(all_documents, config.MILVUS_COLLECTION_NAME)
+            with stage_timer(trace, "indexing"):
+                vector_store = await index_document_chunks(all_documents, config.MILVUS_COLLECTION_NAME)
             if not vector_store:
                 raise HTTPException(
                     status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                     detail="Failed to index documents"
                 )
             logger.info(f"Successfully indexed {len(all_documents)} chunks from {len(processed_files)} files")
+            # New chunks shift the category centroids; rebuild them in the background
+            schedule_centroid_build()
         else:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -88,7 +119,4 @@ async def ingest_documents(
             detail=f"Document processing and indexing failed: {str(e)}"
         )
 
-    return IngestResponse(
-        message=f"Successfully processed and indexed {len(processed_files)} files",
-        filename=", ".join(processed_files)
-    )
\ No newline at end of file
+    return processed_files
@@ -44,6 +44,43 @@ class Config:
     MILVUS_RANKER_TYPE: str = os.getenv("MILVUS_RANKER_TYPE", "rrf")
     MILVUS_RANKER_PARAMS: Dict[str, Any] = field(default_factory=lambda: json.loads(os.getenv("MILVUS_RANKER_PARAMS", "{}")))
     MILVUS_SPARSE_RANKER_PARAMS: Dict[str, Any] = field(default_factory=lambda: json.loads(os.getenv("MILVUS_SPARSE_RANKER_PARAMS", "{}")))
+    RAG_TOP_K: int = int(os.getenv("RAG_TOP_K", "2"))  # Chunks passed to the LLM per question
+    # Citations are extracted from the retrieved chunks server-side rather than generated by the LLM
+    SOURCE_SNIPPET_SENTENCES: int = int(os.getenv("SOURCE_SNIPPET_SENTENCES", "2"))  # Sentences per snippet window
+    SOURCE_SNIPPET_MAX_CHARS: int = int(os.getenv("SOURCE_SNIPPET_MAX_CHARS", "300"))
+    # JSON profile written by app.tools.autotune_search; its values override the settings above
+    MILVUS_SEARCH_PROFILE: str = os.getenv("MILVUS_SEARCH_PROFILE", "")
+    # Per-request search effort presets (keys: k, fetch_k, ef, drop_ratio_search, rrf_k); empty preset = defaults
+    SEARCH_EFFORT_PROFILES: Dict[str, Dict[str, Any]] = field(default_factory=lambda: json.loads(os.getenv("SEARCH_EFFORT_PROFILES", '{"low": {"ef": 64, "fetch_k": 20}, "medium": {}, "high": {"ef": 500, "fetch_k": 100}}')))
+
+    # === Category Routing ===
+    CATEGORIES: List[str] = field(default_factory=lambda: ["api", "security", "pricing", "support", "other"])
+    CATEGORY_ROUTING_ENABLED: bool = os.getenv("CATEGORY_ROUTING_ENABLED", "true").lower() == "true"
+    CATEGORY_PARTITION_KEY_FIELD: str = os.getenv("CATEGORY_PARTITION_KEY_FIELD", "category")
+    CATEGORY_DEFAULT: str = os.getenv("CATEGORY_DEFAULT", "other")
+    # Maps a document file stem to the category partition its chunks are stored in
+    CATEGORY_DOCUMENT_MAP: Dict[str, str] = field(default_factory=lambda: json.loads(os.getenv("CATEGORY_DOCUMENT_MAP", '{"policy_api": "api", "product_quickstart": "api", "policy_security": "security", "policy_pricing": "pricing", "support_faq": "support", "troubleshooting": "support", "changelog": "other"}')))
+    # Short prototype descriptions used as centroids until the collection holds vectors for a category
+    CATEGORY_SEED_DESCRIPTIONS: Dict[str, str] = field(default_factory=lambda: json.loads(os.getenv("CATEGORY_SEED_DESCRIPTIONS", '{"api": "API authentication, API keys, rate limits, endpoints, request and response formats, JSON schema", "security": "security, compliance, encryption, PII redaction, data residency, regions, access control, model training on customer data", "pricing": "pricing, plans, monthly cost, overage charges, tokens, vector ops, discounts, billing", "support": "support, FAQ, troubleshooting, errors, citations, snippets, on-prem deployment, hallucinations", "other": "product changelog, release notes, announcements"}')))
+    CATEGORY_ROUTING_MIN_CONFIDENCE: float = float(os.getenv("CATEGORY_ROUTING_MIN_CONFIDENCE", "0.6"))
+    CATEGORY_ROUTING_TEMPERATURE: float = float(os.getenv("CATEGORY_ROUTING_TEMPERATURE", "0.05"))
+    CATEGORY_ROUTING_MAX_PARTITIONS: int = int(os.getenv("CATEGORY_ROUTING_MAX_PARTITIONS", "2"))
+    CATEGORY_CENTROID_SAMPLE_SIZE: int = int(os.getenv("CATEGORY_CENTROID_SAMPLE_SIZE", "1000"))
+    CATEGORY_CENTROID_RETRY_BACKOFF: float = float(os.getenv("CATEGORY_CENTROID_RETRY_BACKOFF", "5.0"))  # Seconds after a failed build, doubling
+    CATEGORY_CENTROID_RETRY_MAX_BACKOFF: float = float(os.getenv("CATEGORY_CENTROID_RETRY_MAX_BACKOFF", "300.0"))
+
+    # === FAQ Fast Path ===
+    FAQ_DETECTION_ENABLED: bool = os.getenv("FAQ_DETECTION_ENABLED", "true").lower() == "true"
+    # `- **Term**: answer` bullets are FAQ answers only in documents/sections whose name matches this
+    FAQ_SECTION_PATTERN: str = os.getenv("FAQ_SECTION_PATTERN", r"\bfaq\b|frequently asked|q&a|troubleshooting")
+    FAQ_FAST_PATH_ENABLED: bool = os.getenv("FAQ_FAST_PATH_ENABLED", "true").lower() == "true"
+    # Thresholds are fractions of the hybrid ranker's highest possible score (2/(k+1) for RRF), so
+    # they hold for any RRF k. Defaults equal the former absolute 0.032/0.0004 at k=60.
+    FAQ_FAST_PATH_MIN_SCORE: float = float(os.getenv("FAQ_FAST_PATH_MIN_SCORE", "0.976"))
+    FAQ_FAST_PATH_MIN_MARGIN: float = float(os.getenv("FAQ_FAST_PATH_MIN_MARGIN", "0.0122"))
+    # Rank agreement alone does not show the FAQ answers the question; the question must also be close in meaning
+    FAQ_FAST_PATH_MIN_SIMILARITY: float = float(os.getenv("FAQ_FAST_PATH_MIN_SIMILARITY", "0.85"))  # Dense cosine to the FAQ question
+    FAQ_FAST_PATH_CONFIDENCE: float = float(os.getenv("FAQ_FAST_PATH_CONFIDENCE", "0.9"))
 
     # === Model Configuration ===
     LLM_MODEL_NAME: str = os.getenv("LLM_MODEL_NAME", "mistralai/Mistral-7B-Instruct-v0.3")
@@ -53,6 +90,27 @@ class Config:
     LLM_API_BASE: str = os.getenv("LLM_API_BASE", "http://localhost:8000/v1")
     VLLM_EMBEDDING_URL: str = os.getenv("VLLM_EMBEDDING_URL", "http://localhost:8020/v1")
     LLM_API_KEY: str = os.getenv("LLM_API_KEY","EMPTY")  # Default for vLLM compatibility
+    # Comma-separated vLLM replicas; generations go to the one with the fewest outstanding requests.
+    # Empty means LLM_API_BASE is the only endpoint.
+    LLM_API_BASES: List[str] = field(default_factory=lambda: [url.strip() for url in os.getenv("LLM_API_BASES", "").split(",") if url.strip()])
+    LLM_CIRCUIT_FAILURE_THRESHOLD: int = int(os.getenv("LLM_CIRCUIT_FAILURE_THRESHOLD", "3"))  # Consecutive failures that eject a replica
+    LLM_CIRCUIT_RESET_TIMEOUT: float = float(os.getenv("LLM_CIRCUIT_RESET_TIMEOUT", "10.0"))  # Seconds before an ejected replica is probed again
+    # Per-replica timeout; only these (not a request running out of its own deadline) count as replica failures
+    LLM_REQUEST_TIMEOUT: float = float(os.getenv("LLM_REQUEST_TIMEOUT", "60.0"))  # Seconds
+    # Hedging: if the first token has not arrived after the p-quantile of recent time-to-first-token,
+    # send a duplicate to another replica and keep whichever answers first
+    LLM_HEDGING_ENABLED: bool = os.getenv("LLM_HEDGING_ENABLED", "false").lower() == "true"
+    LLM_HEDGE_QUANTILE: float = float(os.getenv("LLM_HEDGE_QUANTILE", "0.95"))
+    LLM_HEDGE_MIN_DELAY: float = float(os.getenv("LLM_HEDGE_MIN_DELAY", "0.05"))  # Seconds
+    LLM_HEDGE_MIN_SAMPLES: int = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))  # Samples needed before hedging starts
+    LLM_HEDGE_WINDOW: int = int(os.getenv("LLM_HEDGE_WINDOW", "200"))  # Recent time-to-first-token samples kept
+    # In-process CPU encoder for query embeddings (bulk ingest keeps using VLLM_EMBEDDING_URL)
+    LOCAL_QUERY_EMBEDDER_ENABLED: bool = os.getenv("LOCAL_QUERY_EMBEDDER_ENABLED", "false").lower() == "true"
+    LOCAL_EMBEDDING_MODEL_PATH: str = os.getenv("LOCAL_EMBEDDING_MODEL_PATH", "")  # Local copy of EMBEDDING_MODEL_NAME weights
+    LOCAL_EMBEDDING_QUANTIZE_INT8: bool = os.getenv("LOCAL_EMBEDDING_QUANTIZE_INT8", "false").lower() == "true"
+    LOCAL_EMBEDDING_THREADS: int = int(os.getenv("LOCAL_EMBEDDING_THREADS", "2"))
+    LOCAL_EMBEDDING_PARITY_MIN_COSINE: float = float(os.getenv("LOCAL_EMBEDDING_PARITY_MIN_COSINE", "0.99"))
+    LOCAL_EMBEDDING_PARITY_TEXTS: List[str] = field(default_factory=lambda: json.loads(os.getenv("LOCAL_EMBEDDING_PARITY_TEXTS", '["What are the rate limits on Pro?", "How does PiHex handle PII?", "What is the overage cost for tokens?"]')))
     MODEL_CONTEXT_LENGTH: int = 7000  # Maximum context length for the model
     LLM_REPHRASER_MAX_TOKENS: int = int(os.getenv("LLM_REPHRASER_MAX_TOKENS", "100"))
     LLM_GUIDED_MESSAGE_MAX_TOKENS: int = int(os.getenv("LLM_GUIDED_MESSAGE_MAX_TOKENS", "500"))
@@ -68,12 +126,52 @@ class Config:
     REDIS_RETRY_ATTEMPTS: int = int(os.getenv("REDIS_RETRY_ATTEMPTS", "3"))
     REDIS_RETRY_DELAY: float = float(os.getenv("REDIS_RETRY_DELAY", "1.0"))
     CONVERSATION_HISTORY_LIMIT: int = int(os.getenv("CONVERSATION_HISTORY_LIMIT", "5"))
+    # === Admission Control (/api/ask) ===
+    ADMISSION_CONTROL_ENABLED: bool = os.getenv("ADMISSION_CONTROL_ENABLED", "true").lower() == "true"
+    ADMISSION_RETRIEVAL_MAX_IN_FLIGHT: int = int(os.getenv("ADMISSION_RETRIEVAL_MAX_IN_FLIGHT", "32"))
+    ADMISSION_RETRIEVAL_MAX_QUEUE: int = int(os.getenv("ADMISSION_RETRIEVAL_MAX_QUEUE", "128"))
+    ADMISSION_RETRIEVAL_SERVICE_TIME: float = float(os.getenv("ADMISSION_RETRIEVAL_SERVICE_TIME", "0.2"))  # Initial estimate, seconds
+    ADMISSION_LLM_MAX_IN_FLIGHT: int = int(os.getenv("ADMISSION_LLM_MAX_IN_FLIGHT", "8"))
+    ADMISSION_LLM_MAX_QUEUE: int = int(os.getenv("ADMISSION_LLM_MAX_QUEUE", "32"))
+    ADMISSION_LLM_SERVICE_TIME: float = float(os.getenv("ADMISSION_LLM_SERVICE_TIME", "2.0"))  # Initial estimate, seconds
+    ADMISSION_DEFAULT_DEADLINE: float = float(os.getenv("ADMISSION_DEFAULT_DEADLINE", "0"))  # Seconds for /api/ask requests sent without one; 0 = no deadline
+    REQUEST_DEADLINE_HEADER: str = os.getenv("REQUEST_DEADLINE_HEADER", "X-Request-Deadline-Ms")  # Remaining client budget in ms
+    DISCONNECT_POLL_INTERVAL: float = float(os.getenv("DISCONNECT_POLL_INTERVAL", "0.25"))  # Seconds
+
+    # === Diagnostics ===
+    ADMIN_API_KEY: str = os.getenv("ADMIN_API_KEY", "")  # Admin endpoints are disabled while empty
+    ADMIN_API_KEY_HEADER: str = os.getenv("ADMIN_API_KEY_HEADER", "X-Admin-Key")
+    PROFILER_MAX_SECONDS: float = float(os.getenv("PROFILER_MAX_SECONDS", "60"))
+    PROFILER_DEFAULT_INTERVAL_MS: float = float(os.getenv("PROFILER_DEFAULT_INTERVAL_MS", "10"))  # 100 Hz
+    SLOW_REQUEST_THRESHOLD_MS: float = float(os.getenv("SLOW_REQUEST_THRESHOLD_MS", "2000"))
+    SLOW_REQUEST_BUFFER_SIZE: int = int(os.getenv("SLOW_REQUEST_BUFFER_SIZE", "100"))  # Most recent slow requests kept
+
     # === Server Configuration ===
     PORT: int = int(os.getenv("PORT", "8098"))
     DEBUG_MODE: bool = os.getenv("DEBUG_MODE", "false").lower() == "true"
     LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO").upper()
     LOG_FORMAT: str = os.getenv("LOG_FORMAT", '%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 
+    def __post_init__(self):
+        if self.MILVUS_SEARCH_PROFILE:
+            self.load_search_profile(self.MILVUS_SEARCH_PROFILE)
+
+    def load_search_profile(self, path: str) -> None:
+        """Apply a search tuning profile (JSON mapping of Config attribute names to values)."""
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                profile = json.load(f)
+        except (OSError, ValueError) as e:
+            logging.getLogger(__name__).error(f"Could not load search profile {path}: {e}")
+            return
+
+        for key, value in profile.get("settings", {}).items():
+            if hasattr(self, key):
+                setattr(self, key, value)
+        # Merge per preset, so a profile that only sets some keys keeps the rest of each preset
+        for name, preset in profile.get("effort_profiles", {}).items():
+            self.SEARCH_EFFORT_PROFILES[name] = {**self.SEARCH_EFFORT_PROFILES.get(name, {}), **preset}
+
     @property
     def MILVUS_URI(self) -> str:
         """Construct Milvus URI from host and port."""
@@ -103,17 +201,25 @@ class Config:
     @property
     def MILVUS_SEARCH_PARAMS(self) -> List[Dict[str, Any]]:
         """Get Milvus search parameters."""
+        return self.get_search_params()
+
+    def get_search_params(
+        self,
+        ef: Optional[int] = None,
+        drop_ratio_search: Optional[float] = None
+    ) -> List[Dict[str, Any]]:
+        """Get Milvus search parameters with optional per-request overrides."""
         return [
             {
                 "metric_type": "COSINE",
                 "params": {
-                    "ef": self.MILVUS_SEARCH_EF
+                    "ef": ef if ef is not None else self.MILVUS_SEARCH_EF
                 }
             },
             {
                 "metric_type": "BM25",
                 "params": {
-                    "drop_ratio_search": self.MILVUS_SEARCH_DROP_RATIO
+                    "drop_ratio_search": drop_ratio_search if drop_ratio_search is not None else self.MILVUS_SEARCH_DROP_RATIO
                 }
             }
         ]
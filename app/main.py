@@ -4,12 +4,16 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
 from app.api.health import health_router
-from app.config.config import Config
+from app.config.config import Config, config
 from app.api.ingest import ingest_router
 
 from app.api.ask_api import ask_router
+from app.api.metrics import metrics_router
+from app.api.admin import admin_router
 
-from app.utils.milvus_utils import setup_milvus_database, initialize_embeddings, get_vector_store
+from app.utils.milvus_utils import setup_milvus_database, get_vector_store, get_missing_metadata_fields
+from app.rag.category_router import build_category_centroids
+from app.utils.embedding_utils import initialize_query_embedding_model, shutdown_query_embedding_model
 from contextlib import asynccontextmanager
 
 # Configure logging
@@ -43,10 +47,10 @@ def create_app() -> FastAPI:
                 
             # Step 2: Initialize embedding model
             logger.info("Initializing embedding model...")
-            embedding_model = initialize_embeddings()
+            embedding_model = await initialize_query_embedding_model()
             if not embedding_model:
                 raise RuntimeError("Failed to initialize embedding model")
-            logger.info("Embedding model initialized successfully")
+            logger.info(f"Embedding model initialized successfully ({type(embedding_model).__name__} for queries)")
             
             # Step 3: Initialize vector store singleton
             logger.info("Initializing vector store...")
@@ -54,12 +58,27 @@ def create_app() -> FastAPI:
             if not vector_store:
                 raise RuntimeError("Failed to initialize vector store")
             logger.info("Vector store initialized successfully")
+
+            # Collections created before FAQ metadata existed cannot serve the fast path
+            missing_fields = get_missing_metadata_fields()
+            if missing_fields:
+                logger.error(
+                    f"Collection '{config.MILVUS_COLLECTION_NAME}' lacks metadata fields {missing_fields}; "
+                    "drop it and re-ingest all documents. FAQ fast path disabled and ingestion will be rejected."
+                )
+                config.FAQ_FAST_PATH_ENABLED = False
+
+            # Step 4: Build category routing centroids (non-fatal, falls back to global search)
+            if Config.CATEGORY_ROUTING_ENABLED:
+                logger.info("Building category routing centroids...")
+                if not await build_category_centroids():
+                    logger.warning("Category routing unavailable; questions will use global search")
             
             yield  # Application runs here
             
             # Shutdown: Cleanup resources
             logger.info("Shutting down application...")
-            # Add cleanup code here if needed
+            shutdown_query_embedding_model()
             
         except Exception as e:
             logger.error(f"Application lifecycle error: {str(e)}")
@@ -83,11 +102,18 @@ def create_app() -> FastAPI:
     # Include routers
     app.include_router(health_router)
     app.include_router(ingest_router)
+    app.include_router(metrics_router)
     app.include_router(
         ask_router,
         prefix="/api",
         tags=["chat"]
     )
+    app.include_router(
+        admin_router,
+        prefix="/admin",
+        tags=["admin"],
+        include_in_schema=False
+    )
 
     return app
 
@@ -1,9 +1,12 @@
 from typing import List
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import Literal, Optional
 
 class QueryRequest(BaseModel):
     question: str
+    search_effort: Optional[str] = Field(None, description="Search effort preset (e.g. low, medium, high); lower effort trades recall for latency.")
+    priority: Literal["high", "normal", "low"] = Field("normal", description="Admission priority class when the service is under load.")
+    deadline_ms: Optional[int] = Field(None, gt=0, description="Time budget for the whole request in milliseconds; the pipeline is cancelled once it is spent.")
 
 class Source(BaseModel):
     doc: str
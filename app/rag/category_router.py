@@ -0,0 +1,222 @@
+import asyncio
+import logging
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from app.config.config import config
+from app.utils.embedding_utils import aembed_query_cached, get_dense_embedding_model
+from app.utils.milvus_utils import sample_dense_vectors_by_category
+
+logger = logging.getLogger(__name__)
+
+# Centroids are shared by all requests and rebuilt in the background after ingestion
+_centroid_lock = threading.Lock()
+_centroids: Optional[np.ndarray] = None
+_centroid_labels: List[str] = []
+
+# One build at a time; failed builds are retried with exponential backoff
+_build_lock = asyncio.Lock()
+_build_task: Optional[asyncio.Task] = None
+_rebuild_requested = False
+_failed_builds = 0
+_retry_at = 0.0
+
+
+@dataclass
+class CategoryPrediction:
+    """Result of routing a question to one or more category partitions."""
+    category: str
+    confidence: float
+    partitions: List[str] = field(default_factory=list)  # Empty means global search
+    scores: Dict[str, float] = field(default_factory=dict)
+
+    @property
+    def expr(self) -> Optional[str]:
+        """Milvus filter expression restricting search to the predicted partitions."""
+        if not self.partitions:
+            return None
+        values = ", ".join(f'"{category}"' for category in self.partitions)
+        return f"{config.CATEGORY_PARTITION_KEY_FIELD} in [{values}]"
+
+
+def _normalise(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.clip(norms, 1e-12, None)
+
+
+def schedule_centroid_build() -> None:
+    """
+    Rebuild the centroids in a background task, keeping the current ones until it finishes.
+
+    If a build is already running it is repeated once it finishes, so vectors
+    inserted meanwhile are included. Must be called from the event loop.
+    """
+    global _build_task, _rebuild_requested
+    if _build_task is not None and not _build_task.done():
+        _rebuild_requested = True
+        return
+    _build_task = asyncio.get_running_loop().create_task(_build_in_background())
+
+
+async def _build_in_background() -> None:
+    global _rebuild_requested
+    while True:
+        _rebuild_requested = False
+        await build_category_centroids()
+        if not _rebuild_requested:
+            return
+
+
+async def build_category_centroids() -> bool:
+    """
+    Build one L2-normalised centroid per category.
+
+    Centroids come from dense vectors already stored in each category partition,
+    so no extra embedding calls are needed for indexed categories. Categories
+    without stored vectors fall back to an embedding of their seed description.
+
+    Only one build runs at a time; concurrent callers wait for it. After a
+    failure, classify_question does not start another build until the backoff
+    (CATEGORY_CENTROID_RETRY_BACKOFF, doubling up to CATEGORY_CENTROID_RETRY_MAX_BACKOFF) has passed.
+
+    Returns:
+        bool: True if at least one centroid is available
+    """
+    async with _build_lock:
+        built = await _build_category_centroids()
+    _record_build(built)
+    return built
+
+
+def _record_build(built: bool) -> None:
+    global _failed_builds, _retry_at
+    if built:
+        _failed_builds = 0
+        _retry_at = 0.0
+        return
+    _failed_builds += 1
+    backoff = min(
+        config.CATEGORY_CENTROID_RETRY_BACKOFF * 2 ** (_failed_builds - 1),
+        config.CATEGORY_CENTROID_RETRY_MAX_BACKOFF
+    )
+    _retry_at = time.monotonic() + backoff
+    logger.warning(f"Category centroid build failed {_failed_builds} time(s); next attempt in {backoff:.0f}s")
+
+
+async def _build_category_centroids() -> bool:
+    global _centroids, _centroid_labels
+    try:
+        sampled = await asyncio.to_thread(sample_dense_vectors_by_category)
+
+        missing = [
+            category for category in config.CATEGORIES
+            if category not in sampled and category in config.CATEGORY_SEED_DESCRIPTIONS
+        ]
+        if missing:
+            seed_vectors = await get_dense_embedding_model().aembed_documents(
+                [config.CATEGORY_SEED_DESCRIPTIONS[category] for category in missing]
+            )
+            for category, vector in zip(missing, seed_vectors):
+                sampled[category] = [vector]
+
+        labels = [category for category in config.CATEGORIES if category in sampled]
+        if not labels:
+            logger.warning("No vectors available to build category centroids")
+            return False
+
+        centroids = np.stack([
+            _normalise(np.asarray(sampled[category], dtype=np.float32)).mean(axis=0)
+            for category in labels
+        ])
+        with _centroid_lock:
+            _centroids = _normalise(centroids)
+            _centroid_labels = labels
+
+        logger.info(
+            f"Built category centroids for {labels} "
+            f"({len(missing)} from seed descriptions)"
+        )
+        return True
+
+    except Exception as e:
+        logger.error(f"Failed to build category centroids: {e}", exc_info=True)
+        return False
+
+
+async def classify_question(
+    question: str,
+    query_vector: Optional[Sequence[float]] = None
+) -> Optional[CategoryPrediction]:
+    """
+    Classify a question by cosine similarity to the category centroids.
+
+    Similarities are turned into probabilities with a temperature softmax. The
+    highest-probability categories are added to the search partitions until
+    their cumulative probability reaches CATEGORY_ROUTING_MIN_CONFIDENCE; if that
+    takes more than CATEGORY_ROUTING_MAX_PARTITIONS categories the prediction
+    carries no partitions and the caller should search globally.
+
+    Requests never build centroids themselves: while none are available the
+    build is started in the background (subject to backoff) and None is returned.
+
+    Args:
+        question (str): The user question
+        query_vector (Optional[Sequence[float]]): Precomputed question embedding
+
+    Returns:
+        Optional[CategoryPrediction]: The prediction, or None if routing is unavailable
+    """
+    if not config.CATEGORY_ROUTING_ENABLED:
+        return None
+
+    if _centroids is None:
+        if time.monotonic() >= _retry_at:
+            schedule_centroid_build()
+        return None
+
+    try:
+        if query_vector is None:
+            query_vector = await aembed_query_cached(question)
+
+        with _centroid_lock:
+            centroids, labels = _centroids, _centroid_labels
+        if centroids is None:
+            return None
+
+        query = _normalise(np.asarray(query_vector, dtype=np.float32))
+        similarities = centroids @ query
+
+        logits = similarities / max(config.CATEGORY_ROUTING_TEMPERATURE, 1e-6)
+        probabilities = np.exp(logits - logits.max())
+        probabilities /= probabilities.sum()
+
+        order = np.argsort(-probabilities)
+        partitions: List[str] = []
+        cumulative = 0.0
+        for index in order[:config.CATEGORY_ROUTING_MAX_PARTITIONS]:
+            partitions.append(labels[index])
+            cumulative += float(probabilities[index])
+            if cumulative >= config.CATEGORY_ROUTING_MIN_CONFIDENCE:
+                break
+        else:
+            partitions = []
+
+        prediction = CategoryPrediction(
+            category=labels[order[0]],
+            confidence=float(probabilities[order[0]]),
+            partitions=partitions,
+            scores={labels[i]: float(probabilities[i]) for i in order}
+        )
+        logger.info(
+            f"Routed question to {prediction.partitions or 'global search'} "
+            f"(category: {prediction.category}, confidence: {prediction.confidence:.3f})"
+        )
+        return prediction
+
+    except Exception as e:
+        logger.error(f"Error classifying question: {e}", exc_info=True)
+        return None
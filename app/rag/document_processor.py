@@ -5,6 +5,7 @@ import json
 from typing import List, Dict, Union, TextIO, Iterator, Tuple, IO
 from langchain_core.documents import Document
 from langchain_text_splitters import MarkdownHeaderTextSplitter
+from app.config.config import config
 import logging
 
 logger = logging.getLogger(__name__)
@@ -42,6 +43,82 @@ def load_markdown_content(file_path_or_obj: Union[str, TextIO, IO[bytes]]) -> st
         raise ValueError(f"Error reading markdown content: {str(e)}")
 
 
+def get_document_category(doc_name: str) -> str:
+    """Resolve the category partition for a document from its file name."""
+    stem = os.path.splitext(os.path.basename(doc_name or ""))[0].lower()
+    return config.CATEGORY_DOCUMENT_MAP.get(stem, config.CATEGORY_DEFAULT)
+
+
+# "**Question?**" on its own line, answered by the following lines
+_BOLD_QUESTION_RE = re.compile(r"^\*\*(?P<question>[^*]+\?)\*\*\s*$")
+# "- **Term**: answer" on a single bullet line
+_BULLET_TERM_RE = re.compile(r"^[-*]\s+\*\*(?P<question>[^*]+)\*\*\s*:\s*(?P<answer>.+)$")
+
+
+def is_faq_section(doc_name: str, headings: List[str]) -> bool:
+    """Whether the document name or a section heading marks FAQ-shaped content (FAQ_SECTION_PATTERN)."""
+    pattern = re.compile(config.FAQ_SECTION_PATTERN, re.IGNORECASE)
+    stem = os.path.splitext(os.path.basename(doc_name or ""))[0].replace("_", " ")
+    return any(pattern.search(text) for text in [stem, *headings] if text)
+
+
+def split_qa_section(text: str, term_bullets: bool = False) -> Tuple[List[Tuple[str, str]], str]:
+    """
+    Split FAQ-style markdown into question/answer pairs and the remaining text.
+
+    Recognises bold question lines followed by their answer lines and, if
+    `term_bullets` is set, `- **Term**: answer` bullets (glossary bullets are
+    only answers in FAQ-shaped sections). Returns no pairs unless at least two
+    are found, so ordinary prose is never treated as an FAQ. The remainder holds
+    every line that is not part of a pair (headings included), in order.
+    """
+    pairs: List[Tuple[str, str]] = []
+    remainder: List[str] = []
+    question = None
+    question_line = ""
+    answer_lines: List[str] = []
+
+    def flush():
+        if question and answer_lines:
+            pairs.append((question, " ".join(answer_lines)))
+        elif question:
+            remainder.append(question_line)
+
+    for raw_line in text.splitlines():
+        line = raw_line.strip()
+        if not line:
+            continue
+        if line.startswith("#"):
+            remainder.append(raw_line)
+            continue
+
+        bullet = _BULLET_TERM_RE.match(line) if term_bullets else None
+        if bullet:
+            flush()
+            question, answer_lines = None, []
+            pairs.append((bullet.group("question").strip(), bullet.group("answer").strip()))
+            continue
+
+        bold = _BOLD_QUESTION_RE.match(line)
+        if bold:
+            flush()
+            question, question_line, answer_lines = bold.group("question").strip(), raw_line, []
+        elif question:
+            answer_lines.append(re.sub(r"^[-*]\s+", "", line))
+        else:
+            remainder.append(raw_line)
+
+    flush()
+    if len(pairs) < 2:
+        return [], text
+    return pairs, "\n".join(remainder)
+
+
+def extract_qa_pairs(text: str, term_bullets: bool = False) -> List[Tuple[str, str]]:
+    """Question/answer pairs in FAQ-style markdown (see split_qa_section)."""
+    return split_qa_section(text, term_bullets)[0]
+
+
 def load_and_chunk_document(file_path_or_obj: Union[str, TextIO, IO[bytes]]) -> List[Document]:
     """Loads a markdown document and splits it into header-based chunks."""
     doc_name = (
@@ -67,23 +144,43 @@ def load_and_chunk_document(file_path_or_obj: Union[str, TextIO, IO[bytes]]) ->
         strip_headers=False
     )
 
+    category = get_document_category(doc_name)
+
     try:
         split_docs = splitter.split_text(content_str)
         
         chunks = []
+        faq_chunks = 0
         for d in split_docs:
             metadata = d.metadata if hasattr(d, 'metadata') else {}
-            chunks.append(Document(
-                page_content=d.page_content,
-                metadata={
-                    "document_name": doc_name,
-                    "section_name": metadata.get("header1", "").strip(),
-                    "heading": metadata.get("header2", "").strip(),
-                    "sub_heading": metadata.get("header3", "").strip(),
-                }
-            ))
-
-        logger.info(f"Generated {len(chunks)} chunks for document: {doc_name}.")
+            # Every chunk carries the same metadata keys: Milvus infers the schema from the first insert
+            base_metadata = {
+                "document_name": doc_name,
+                "section_name": metadata.get("header1", "").strip(),
+                "heading": metadata.get("header2", "").strip(),
+                "sub_heading": metadata.get("header3", "").strip(),
+                config.CATEGORY_PARTITION_KEY_FIELD: category,
+                "chunk_type": "section",
+                "faq_answer": "",
+            }
+
+            # Q/A structured sections are indexed as one canonical answer per pair;
+            # any other text in the section stays searchable as a normal chunk
+            qa_pairs, remainder = [], d.page_content
+            if config.FAQ_DETECTION_ENABLED:
+                headings = [base_metadata["section_name"], base_metadata["heading"], base_metadata["sub_heading"]]
+                qa_pairs, remainder = split_qa_section(d.page_content, term_bullets=is_faq_section(doc_name, headings))
+            for question, answer in qa_pairs:
+                chunks.append(Document(
+                    page_content=f"{question}\n{answer}",
+                    metadata={**base_metadata, "chunk_type": "faq", "faq_answer": answer}
+                ))
+            faq_chunks += len(qa_pairs)
+
+            if not qa_pairs or any(line.strip() and not line.lstrip().startswith("#") for line in remainder.splitlines()):
+                chunks.append(Document(page_content=remainder, metadata=base_metadata))
+
+        logger.info(f"Generated {len(chunks)} chunks ({faq_chunks} FAQ answers) for document: {doc_name} (category: {category}).")
         return chunks
     except Exception as e:
         logger.error(f"Error during chunking of document {doc_name}: {e}", exc_info=True)
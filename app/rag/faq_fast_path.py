@@ -0,0 +1,93 @@
+import logging
+from typing import Any, Dict, List, Optional, Sequence
+import numpy as np
+from langchain_core.documents import Document
+from app.config.config import config
+from app.models.models import AnswerPayload, Source
+from app.utils.embedding_utils import aembed_query_cached
+
+logger = logging.getLogger(__name__)
+
+# Dense and sparse (BM25) legs of the hybrid search
+HYBRID_SEARCH_LEGS = 2
+
+
+def max_fused_score(ranker_type: Optional[str] = None, ranker_params: Optional[Dict[str, Any]] = None) -> float:
+    """Highest score the hybrid ranker can give: a chunk ranked first by every leg."""
+    ranker_type = ranker_type or config.MILVUS_RANKER_TYPE
+    ranker_params = ranker_params or config.MILVUS_RANKER_PARAMS
+    if ranker_type == "rrf":
+        # Milvus RRFRanker defaults to k=60
+        return HYBRID_SEARCH_LEGS / (float(ranker_params.get("k") or 60) + 1)
+    # WeightedRanker sums weight * score normalised into [0, 1]
+    return float(sum(ranker_params.get("weights", [1.0] * HYBRID_SEARCH_LEGS)))
+
+
+def faq_question(doc: Document) -> str:
+    """The question of an FAQ chunk (its first line; the stored answer follows)."""
+    return doc.page_content.split("\n", 1)[0].strip()
+
+
+def cosine_similarity(a: Sequence[float], b: Sequence[float]) -> float:
+    a, b = np.asarray(a, dtype=np.float32), np.asarray(b, dtype=np.float32)
+    return float(a @ b / max(float(np.linalg.norm(a) * np.linalg.norm(b)), 1e-12))
+
+
+async def match_faq_answer(
+    docs: List[Document],
+    query_vector: Sequence[float],
+    fallback_category: Optional[str] = None,
+    ranker_type: Optional[str] = None,
+    ranker_params: Optional[Dict[str, Any]] = None
+) -> Optional[AnswerPayload]:
+    """
+    Build an answer directly from a canonical FAQ chunk, skipping the LLM.
+
+    The top hybrid-search hit is used only if it is an FAQ chunk and the
+    question it answers is semantically close to the user's: the dense cosine
+    between the two must be at least FAQ_FAST_PATH_MIN_SIMILARITY. RRF scores
+    depend only on rank, so the fused-score checks (FAQ_FAST_PATH_MIN_SCORE,
+    FAQ_FAST_PATH_MIN_MARGIN, fractions of the ranker's highest possible score)
+    only confirm that both search legs agree on the chunk; they are checked first
+    because they need no embedding.
+
+    Args:
+        docs (List[Document]): Retrieved documents, best first, with `distance` scores
+        query_vector (Sequence[float]): Dense embedding of the user question
+        fallback_category (Optional[str]): Category to use if the chunk has none
+        ranker_type (Optional[str]): Ranker the search used (default MILVUS_RANKER_TYPE)
+        ranker_params (Optional[Dict[str, Any]]): Its parameters (default MILVUS_RANKER_PARAMS)
+
+    Returns:
+        Optional[AnswerPayload]: The stored answer, or None if the match is not confident
+    """
+    if not config.FAQ_FAST_PATH_ENABLED or not docs:
+        return None
+
+    top = docs[0]
+    if top.metadata.get("chunk_type") != "faq" or not top.metadata.get("faq_answer"):
+        return None
+
+    scale = max_fused_score(ranker_type, ranker_params)
+    top_score = float(top.metadata.get("distance", 0.0)) / scale
+    runner_up = float(docs[1].metadata.get("distance", 0.0)) / scale if len(docs) > 1 else 0.0
+    if top_score < config.FAQ_FAST_PATH_MIN_SCORE or top_score - runner_up < config.FAQ_FAST_PATH_MIN_MARGIN:
+        logger.info(f"FAQ fast path skipped (relative score: {top_score:.4f}, margin: {top_score - runner_up:.4f})")
+        return None
+
+    similarity = cosine_similarity(query_vector, await aembed_query_cached(faq_question(top)))
+    if similarity < config.FAQ_FAST_PATH_MIN_SIMILARITY:
+        logger.info(f"FAQ fast path skipped (similarity to FAQ question: {similarity:.4f})")
+        return None
+
+    answer = top.metadata["faq_answer"]
+    logger.info(
+        f"FAQ fast path hit on {top.metadata.get('document_name', '')} "
+        f"(similarity: {similarity:.4f}, relative score: {top_score:.4f})"
+    )
+    return AnswerPayload(
+        answer=answer,
+        category=top.metadata.get("category") or fallback_category or config.CATEGORY_DEFAULT,
+        confidence=config.FAQ_FAST_PATH_CONFIDENCE,
+        sources=[Source(doc=top.metadata.get("document_name", ""), snippet=top.page_content)]
+    )
@@ -6,6 +6,33 @@ from app.utils.milvus_utils import get_vector_store
 
 logger = logging.getLogger(__name__)
 
+def get_search_effort_params(search_effort: Optional[str]) -> Dict[str, Any]:
+    """
+    Translate a search effort preset into retrieve_documents keyword arguments.
+    
+    Args:
+        search_effort (Optional[str]): Name of a preset in config.SEARCH_EFFORT_PROFILES
+        
+    Returns:
+        Dict[str, Any]: Keyword arguments for retrieve_documents (empty for defaults)
+        
+    Raises:
+        ValueError: If the preset is unknown
+    """
+    if not search_effort:
+        return {}
+    if search_effort not in config.SEARCH_EFFORT_PROFILES:
+        raise ValueError(
+            f"Unknown search effort '{search_effort}'. "
+            f"Expected one of: {', '.join(config.SEARCH_EFFORT_PROFILES)}"
+        )
+
+    params = dict(config.SEARCH_EFFORT_PROFILES[search_effort])
+    rrf_k = params.pop("rrf_k", None)
+    if rrf_k is not None:
+        params["ranker_params"] = {**config.MILVUS_RANKER_PARAMS, "k": rrf_k}
+    return params
+
 async def retrieve_documents(
     query: str,
     k: Optional[int] = None,
@@ -14,6 +41,9 @@ async def retrieve_documents(
     ranker_type: Optional[Literal["rrf", "weighted"]] = None,
     ranker_params: Optional[Dict[str, Any]] = None,
     sparse_search: Optional[bool] = False,
+    ef: Optional[int] = None,
+    drop_ratio_search: Optional[float] = None,
+    timeout: Optional[float] = None,
     **kwargs: Any
 ) -> List[Document]:
     """
@@ -26,6 +56,9 @@ async def retrieve_documents(
         fetch_k (Optional[int]): Number of results to fetch before ranking
         ranker_type (Optional[Literal["rrf", "weighted"]]): Type of ranker to use
         ranker_params (Optional[Dict[str, Any]]): Parameters for the ranker
+        ef (Optional[int]): HNSW search breadth override for the dense leg
+        drop_ratio_search (Optional[float]): BM25 drop ratio override for the sparse leg
+        timeout (Optional[float]): Milvus search timeout in seconds (e.g. the request's remaining budget)
         **kwargs: Additional arguments to pass to hybrid search
         
     Returns:
@@ -42,8 +75,8 @@ async def retrieve_documents(
         k = k or config.MILVUS_K
         fetch_k = fetch_k or config.fetch_k
         
-        # Use search parameters from config
-        search_params = config.MILVUS_SEARCH_PARAMS
+        # Use search parameters from config, with any per-request overrides
+        search_params = config.get_search_params(ef=ef, drop_ratio_search=drop_ratio_search)
         
         if sparse_search:
             results = await vector_store._acollection_hybrid_search(
@@ -54,6 +87,7 @@ async def retrieve_documents(
             fetch_k=fetch_k,
             ranker_type=ranker_type or config.MILVUS_RANKER_TYPE,
             ranker_params=ranker_params or config.MILVUS_SPARSE_RANKER_PARAMS,
+            timeout=timeout,
             **kwargs
         )
         
@@ -66,6 +100,7 @@ async def retrieve_documents(
                 fetch_k=fetch_k,
                 ranker_type=ranker_type or config.MILVUS_RANKER_TYPE,
                 ranker_params=ranker_params or config.MILVUS_RANKER_PARAMS,
+                timeout=timeout,
                 **kwargs
             )
         
@@ -77,10 +112,13 @@ async def retrieve_documents(
             entity = hit.get("entity", {})
             
             metadata = {
-                "document_name": entity.get("document_inserted", ""),
+                "document_name": entity.get("document_name", entity.get("document_inserted", "")),
                 "section_name": entity.get("section_name", ""),
                 "heading": entity.get("heading", ""),
                 "sub_heading": entity.get("sub_heading", ""),
+                "category": entity.get(config.CATEGORY_PARTITION_KEY_FIELD, ""),
+                "chunk_type": entity.get("chunk_type", "section"),
+                "faq_answer": entity.get("faq_answer", ""),
                 "distance": hit.get("distance", 0.0)
             }
             
@@ -0,0 +1,121 @@
+import logging
+import re
+from typing import Dict, List, Optional
+
+import numpy as np
+from langchain_core.documents import Document
+from app.config.config import config
+from app.models.models import Source
+
+logger = logging.getLogger(__name__)
+
+# Sentence ends, or line breaks (markdown bullets and table rows are one "sentence" each)
+_SENTENCE_BOUNDARY_RE = re.compile(r"(?<=[.!?])\s+|\n+")
+_WORD_RE = re.compile(r"\w+")
+
+
+def split_sentences(text: str) -> List[str]:
+    return [sentence.strip() for sentence in _SENTENCE_BOUNDARY_RE.split(text) if sentence and sentence.strip()]
+
+
+def sentence_windows(text: str, size: int) -> List[str]:
+    """All runs of `size` consecutive sentences (the whole text if it is shorter)."""
+    sentences = split_sentences(text)
+    if len(sentences) <= size:
+        return [" ".join(sentences)] if sentences else []
+    return [" ".join(sentences[i:i + size]) for i in range(len(sentences) - size + 1)]
+
+
+def _truncate(text: str, max_chars: int) -> str:
+    if len(text) <= max_chars:
+        return text
+    cut = text[:max_chars].rsplit(" ", 1)[0]
+    return cut.rstrip(" ,;:") + "..."
+
+
+def score_windows(answer: str, windows: List[str]) -> np.ndarray:
+    """TF-IDF cosine similarity of every window to the answer, computed as one matrix product."""
+    vocabulary: Dict[str, int] = {}
+    tokenized = [_WORD_RE.findall(window.lower()) for window in windows]
+    for tokens in tokenized:
+        for token in tokens:
+            vocabulary.setdefault(token, len(vocabulary))
+
+    term_counts = np.zeros((len(windows), len(vocabulary)), dtype=np.float32)
+    for row, tokens in enumerate(tokenized):
+        np.add.at(term_counts[row], [vocabulary[token] for token in tokens], 1.0)
+    query = np.zeros(len(vocabulary), dtype=np.float32)
+    answer_terms = [vocabulary[token] for token in _WORD_RE.findall(answer.lower()) if token in vocabulary]
+    np.add.at(query, answer_terms, 1.0)
+
+    document_frequency = (term_counts > 0).sum(axis=0)
+    idf = np.log((1 + len(windows)) / (1 + document_frequency)) + 1.0
+    weighted = term_counts * idf
+    query *= idf
+    norms = np.linalg.norm(weighted, axis=1) * np.linalg.norm(query)
+    return (weighted @ query) / np.maximum(norms, 1e-12)
+
+
+def build_sources(
+    answer: str,
+    docs: List[Document],
+    window_size: Optional[int] = None,
+    max_chars: Optional[int] = None
+) -> List[Source]:
+    """
+    Build citations from the retrieved chunks instead of asking the LLM for them.
+
+    Every chunk is split into windows of `window_size` consecutive sentences and
+    the window most similar to the answer becomes its snippet. Chunks that share
+    no terms with the answer are dropped, unless none do, in which case the top
+    retrieved chunk is cited. An empty answer cites nothing. Sources are ordered
+    by similarity.
+
+    Args:
+        answer (str): The generated answer
+        docs (List[Document]): Retrieved documents (the context given to the LLM)
+        window_size (Optional[int]): Sentences per snippet (default SOURCE_SNIPPET_SENTENCES)
+        max_chars (Optional[int]): Snippet length cap (default SOURCE_SNIPPET_MAX_CHARS)
+
+    Returns:
+        List[Source]: One source per distinct chunk, best match first (none for an empty answer)
+    """
+    if not answer or not answer.strip():
+        return []
+
+    window_size = window_size or config.SOURCE_SNIPPET_SENTENCES
+    max_chars = max_chars or config.SOURCE_SNIPPET_MAX_CHARS
+
+    chunks, seen = [], set()
+    for doc in docs:
+        if doc.page_content not in seen:
+            seen.add(doc.page_content)
+            chunks.append(doc)
+
+    windows: List[str] = []
+    owners: List[int] = []
+    for index, doc in enumerate(chunks):
+        for window in sentence_windows(doc.page_content, window_size):
+            windows.append(window)
+            owners.append(index)
+    if not windows:
+        return []
+
+    scores = score_windows(answer, windows)
+    owner_ids = np.asarray(owners)
+    best = []
+    for index in range(len(chunks)):
+        positions = np.flatnonzero(owner_ids == index)
+        if positions.size:
+            position = positions[np.argmax(scores[positions])]
+            best.append((float(scores[position]), index, windows[position]))
+
+    matched = [entry for entry in best if entry[0] > 0]
+    if not matched:
+        matched = best[:1]
+    matched.sort(key=lambda entry: (-entry[0], entry[1]))
+
+    return [
+        Source(doc=chunks[index].metadata.get("document_name", ""), snippet=_truncate(window, max_chars))
+        for _, index, window in matched
+    ]
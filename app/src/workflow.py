@@ -2,24 +2,81 @@
 
 import logging
 import asyncio
-from typing import Dict, Any
+import time
+from typing import Dict, Any, Optional
 from app.models.models import AnswerPayload
 from langchain_core.output_parsers import JsonOutputParser
-from langchain_core.prompts import ChatPromptTemplate
-from app.utils.llm_utils import get_llm_doc
-from app.rag.retriever import retrieve_documents
-from app.utils.prompts import PROMPT_TEMPLATE
+from app.utils.llm_utils import get_llm_router
+from app.rag.retriever import retrieve_documents, get_search_effort_params
+from app.rag.category_router import classify_question
+from app.utils.embedding_utils import aembed_query_cached, query_embedding_cache
+from app.config.config import config
+from app.utils.prompts import build_prompt
 from app.utils.rag_utils import prepare_document_context
+from app.rag.faq_fast_path import match_faq_answer
+from app.rag.source_snippets import build_sources
+from app.utils.metrics import metrics
+from app.utils.admission import retrieval_admission, llm_admission
+from app.utils.deadlines import remaining_time
+from app.utils.timing import record_timing, stage_timer
 
 logger = logging.getLogger(__name__)
 
-async def process_query(question: str) -> Dict[str, Any]:
+async def process_query(
+    question: str,
+    search_effort: Optional[str] = None,
+    trace: Optional[Dict[str, Any]] = None,
+    priority: str = "normal",
+    deadline: Optional[float] = None
+) -> Dict[str, Any]:
     """
     Given a user question, retrieve relevant documents, construct context, and get structured answer from LLM.
+    `search_effort` selects a preset from config.SEARCH_EFFORT_PROFILES to trade recall for latency.
+    If `trace` is given it is filled with request diagnostics (`answer_path`, per-stage `timings` in ms).
+    Retrieval and generation each wait for an admission slot by `priority`; `deadline`
+    (time.monotonic()) bounds the wait and is passed down as each stage's timeout.
+    Raises AdmissionRejected when the request is shed and DeadlineExceeded when the budget runs out.
     Returns dict matching AnswerPayload schema.
     """
-    # Retrieve relevant documents
-    docs = await retrieve_documents(question, k=2)
+    trace = trace if trace is not None else {}
+    search_kwargs = {"k": config.RAG_TOP_K, **get_search_effort_params(search_effort)}
+
+    # Route the question to its category partitions; fall back to a global search
+    # when the router is unsure or the restricted search finds nothing. The question
+    # is embedded once; routing and every hybrid search reuse the vector.
+    queued = time.perf_counter()
+    async with retrieval_admission.slot(priority, deadline):
+        record_timing(trace, "retrieval_queue", queued)
+        with query_embedding_cache():
+            with stage_timer(trace, "classify"):
+                query_vector = await aembed_query_cached(question)
+                prediction = await classify_question(question, query_vector=query_vector)
+            with stage_timer(trace, "retrieval"):
+                docs = []
+                if prediction and prediction.partitions:
+                    docs = await retrieve_documents(
+                        question, expr=prediction.expr, timeout=remaining_time(deadline), **search_kwargs
+                    )
+                if not docs:
+                    docs = await retrieve_documents(question, timeout=remaining_time(deadline), **search_kwargs)
+    category_routed = (
+        prediction is not None
+        and prediction.confidence >= config.CATEGORY_ROUTING_MIN_CONFIDENCE
+    )
+
+    # Confident FAQ matches are answered from the stored canonical answer without the LLM
+    fast_answer = await match_faq_answer(
+        docs,
+        query_vector,
+        fallback_category=prediction.category if prediction else None,
+        ranker_params=search_kwargs.get("ranker_params")
+    )
+    if fast_answer is not None:
+        trace["answer_path"] = "faq_fast_path"
+        metrics.inc("rag_answers_total", path="faq_fast_path")
+        return fast_answer
+    trace["answer_path"] = "llm"
+
     # context = "\n".join([doc.page_content for doc in docs]) if docs else ""
     # sources = [
     #     {"doc": doc.metadata.get("source", "unknown"), "snippet": doc.page_content[:120]} for doc in docs
@@ -27,20 +84,27 @@ async def process_query(question: str) -> Dict[str, Any]:
     context = await prepare_document_context(docs)
     logger.info(f"Prepared context: {context[:200]}...")  # Log first 200 chars for brevity
 
-    # Build prompt
-    prompt_template = PROMPT_TEMPLATE
-    prompt = ChatPromptTemplate.from_messages([
-        ("system", prompt_template),
-        ("human", f"Context: {context}\nUser Question: {question}\nJSON Output:")
-    ])
+    # Build prompt: static prefix, canonical context, question last (prefix-cache friendly)
+    prompt = build_prompt(context, question, routed=category_routed)
 
-    llm = get_llm_doc()
     parser = JsonOutputParser(pydantic_object=AnswerPayload)
 
-    # Run LLM and parse output
-    chain = prompt | llm | parser
-    result = await chain.ainvoke({"context": context, "question": question})
+    # Run LLM and parse output. Streaming lets a cancelled request close the
+    # connection mid-generation so vLLM aborts the sequence and frees its slot.
+    # Answers are short, so the router may hedge them across replicas.
+    queued = time.perf_counter()
+    async with llm_admission.slot(priority, deadline):
+        record_timing(trace, "llm_queue", queued)
+        with stage_timer(trace, "llm"):
+            output = await get_llm_router().agenerate(prompt, timeout=remaining_time(deadline), hedge=True)
+    result = parser.parse(output)
     logger.info(f"LLM result: {result}")
+    if category_routed and isinstance(result, dict):
+        result["category"] = prediction.category
+    # Citations come from the retrieved chunks, so they never name a document that was not retrieved
+    if isinstance(result, dict):
+        with stage_timer(trace, "sources"):
+            result["sources"] = build_sources(str(result.get("answer", "")), docs)
 
     # Parse and validate result against AnswerPayload schema
     try:
@@ -49,5 +113,6 @@ async def process_query(question: str) -> Dict[str, Any]:
         logger.error(f"LLM output did not match AnswerPayload schema: {e}")
         raise ValueError("Invalid LLM output format")
 
+    metrics.inc("rag_answers_total", path="llm")
     logger.info(f"Final structured answer: {validated}")
     return validated
@@ -0,0 +1,336 @@
+"""
+Recall/latency autotuner for the hybrid search parameters.
+
+Ground truth comes from relevance labels checked exhaustively against every
+chunk in the collection. An eval question's relevant chunks are those that
+contain any of its `expected_contains` strings. A sampled chunk's prefix is
+used as a known-item query whose relevant chunk is the chunk itself.
+
+The tool sweeps HNSW `ef`, `fetch_k`, BM25 `drop_ratio_search` and the RRF `k`
+constant through the real hybrid retrieval path and measures recall@k against
+those labels. Because the labels do not depend on any search setting, every knob
+is judged on the same scale. Query vectors are computed once up front, so only
+search latency is timed. The recall@k vs p95 latency Pareto frontier is
+reported and the recommended point is written as a profile that Config loads
+through MILVUS_SEARCH_PROFILE.
+
+Usage:
+    python -m app.tools.autotune_search --output-dir tuning --target-recall 0.95
+"""
+import argparse
+import asyncio
+import csv
+import itertools
+import json
+import logging
+import os
+import random
+import time
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+from app.config.config import config
+from app.rag.retriever import retrieve_documents
+from app.utils.embedding_utils import get_query_embedding_model, query_embedding_cache
+from app.utils.milvus_utils import get_vector_store, iterate_collection, setup_milvus_database
+
+logger = logging.getLogger(__name__)
+
+EVAL_QUESTIONS_PATH = os.path.abspath(
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'pihex_task_dataset', 'eval_questions.jsonl')
+)
+
+
+@dataclass
+class TrialResult:
+    """Recall and latency of one parameter combination."""
+    ef: int
+    fetch_k: int
+    drop_ratio_search: float
+    rrf_k: int
+    k: int
+    recall: float
+    p50_ms: float
+    p95_ms: float
+    mean_ms: float
+
+    def as_effort_profile(self) -> Dict[str, Any]:
+        return {
+            "ef": self.ef,
+            "fetch_k": self.fetch_k,
+            "drop_ratio_search": self.drop_ratio_search,
+            "rrf_k": self.rrf_k,
+        }
+
+
+def load_eval_set(path: str = EVAL_QUESTIONS_PATH) -> List[Dict[str, Any]]:
+    """Load every record of the eval JSONL file."""
+    records = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                records.append(json.loads(line))
+    return records
+
+
+def load_eval_questions(path: str = EVAL_QUESTIONS_PATH) -> List[str]:
+    """Load the question strings from the eval JSONL file."""
+    return [record["question"] for record in load_eval_set(path)]
+
+
+def load_corpus(collection_name: str) -> List[str]:
+    """Load every chunk text from the collection."""
+    texts: List[str] = []
+    for batch in iterate_collection(collection_name, output_fields=["text"]):
+        texts.extend(row["text"] for row in batch)
+    return texts
+
+
+def build_ground_truth(
+    eval_set: Sequence[Dict[str, Any]],
+    sampled_chunks: Sequence[str],
+    corpus_texts: Sequence[str],
+    chunk_query_chars: int
+) -> Tuple[List[str], List[Set[str]]]:
+    """
+    Queries and their relevant chunk texts, by scanning the whole corpus.
+
+    Eval questions whose `expected_contains` strings appear in no chunk are
+    skipped, since no search setting could retrieve them.
+    """
+    queries: List[str] = []
+    truth: List[Set[str]] = []
+    for record in eval_set:
+        needles = [needle.lower() for needle in record.get("expected_contains", [])]
+        relevant = {text for text in corpus_texts if any(needle in text.lower() for needle in needles)}
+        if not relevant:
+            logger.warning(f"No chunk contains the expected strings of '{record['question']}'; skipping it")
+            continue
+        queries.append(record["question"])
+        truth.append(relevant)
+    for text in sampled_chunks:
+        queries.append(text[:chunk_query_chars])
+        truth.append({text})
+    return queries, truth
+
+
+def recall_at_k(retrieved: Sequence[str], relevant: Set[str], k: int) -> float:
+    """Share of the relevant chunks in the top k, out of as many as fit in k."""
+    return len(set(retrieved[:k]) & relevant) / max(min(len(relevant), k), 1)
+
+
+async def run_trial(
+    queries: Sequence[str],
+    query_vectors: Dict[str, List[float]],
+    truth: Sequence[Set[str]],
+    ef: int,
+    fetch_k: int,
+    drop_ratio_search: float,
+    rrf_k: int,
+    k: int,
+    repeats: int
+) -> TrialResult:
+    """Measure recall@k and per-query hybrid search latency for one parameter combination."""
+    latencies: List[float] = []
+    recalls: List[float] = []
+    ranker_params = {**config.MILVUS_RANKER_PARAMS, "k": rrf_k}
+    for repeat in range(repeats):
+        for query, relevant in zip(queries, truth):
+            # Seeded with the precomputed vector, so the search does not embed the query again
+            with query_embedding_cache({query: query_vectors[query]}):
+                started = time.perf_counter()
+                docs = await retrieve_documents(
+                    query,
+                    k=k,
+                    fetch_k=fetch_k,
+                    ef=ef,
+                    drop_ratio_search=drop_ratio_search,
+                    ranker_type="rrf",
+                    ranker_params=ranker_params,
+                )
+                latencies.append((time.perf_counter() - started) * 1000)
+            if repeat == 0:
+                recalls.append(recall_at_k([doc.page_content for doc in docs], relevant, k))
+
+    latency = np.asarray(latencies)
+    return TrialResult(
+        ef=ef,
+        fetch_k=fetch_k,
+        drop_ratio_search=drop_ratio_search,
+        rrf_k=rrf_k,
+        k=k,
+        recall=float(np.mean(recalls)),
+        p50_ms=float(np.percentile(latency, 50)),
+        p95_ms=float(np.percentile(latency, 95)),
+        mean_ms=float(latency.mean()),
+    )
+
+
+def pareto_frontier(results: Sequence[TrialResult]) -> List[TrialResult]:
+    """Points not dominated on (higher recall, lower p95 latency), ordered by latency."""
+    frontier: List[TrialResult] = []
+    best_recall = -1.0
+    for result in sorted(results, key=lambda r: (r.p95_ms, -r.recall)):
+        if result.recall > best_recall:
+            frontier.append(result)
+            best_recall = result.recall
+    return frontier
+
+
+def pick_fastest(frontier: Sequence[TrialResult], min_recall: float) -> TrialResult:
+    """Fastest frontier point meeting `min_recall`, or the highest-recall point if none does."""
+    for result in frontier:
+        if result.recall >= min_recall:
+            return result
+    return frontier[-1]
+
+
+def write_results(results: Sequence[TrialResult], frontier: Sequence[TrialResult], output_dir: str) -> None:
+    """Write all trials and the frontier as CSV and JSON."""
+    fields = list(asdict(results[0]).keys())
+    for name, rows in (("trials", results), ("frontier", frontier)):
+        with open(os.path.join(output_dir, f"{name}.csv"), "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=fields)
+            writer.writeheader()
+            writer.writerows(asdict(row) for row in rows)
+        with open(os.path.join(output_dir, f"{name}.json"), "w", encoding="utf-8") as f:
+            json.dump([asdict(row) for row in rows], f, indent=2)
+
+
+def plot_frontier(results: Sequence[TrialResult], frontier: Sequence[TrialResult], path: str) -> None:
+    """Plot recall@k vs p95 latency; skipped when matplotlib is not installed."""
+    try:
+        import matplotlib
+        matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+    except ImportError:
+        logger.warning("matplotlib is not installed; skipping frontier plot")
+        return
+
+    fig, ax = plt.subplots(figsize=(8, 5))
+    ax.scatter([r.p95_ms for r in results], [r.recall for r in results], s=12, alpha=0.4, label="trials")
+    ax.plot([r.p95_ms for r in frontier], [r.recall for r in frontier], "o-", color="tab:red", label="Pareto frontier")
+    for r in frontier:
+        ax.annotate(f"ef={r.ef} fk={r.fetch_k} dr={r.drop_ratio_search} k={r.rrf_k}", (r.p95_ms, r.recall), fontsize=7)
+    ax.set_xlabel("p95 latency (ms)")
+    ax.set_ylabel(f"recall@{frontier[0].k}")
+    ax.legend()
+    fig.tight_layout()
+    fig.savefig(path, dpi=120)
+    plt.close(fig)
+
+
+def build_profile(
+    recommended: TrialResult,
+    frontier: Sequence[TrialResult],
+    low_recall: float,
+    target_recall: float
+) -> Dict[str, Any]:
+    """Build the profile consumed by Config.load_search_profile."""
+    return {
+        "embedding_model": config.EMBEDDING_MODEL_NAME,
+        "collection": config.MILVUS_COLLECTION_NAME,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "target_recall": target_recall,
+        "measured": asdict(recommended),
+        "settings": {
+            "MILVUS_SEARCH_EF": recommended.ef,
+            "fetch_k": recommended.fetch_k,
+            "MILVUS_SEARCH_DROP_RATIO": recommended.drop_ratio_search,
+            "MILVUS_RANKER_TYPE": "rrf",
+            "MILVUS_RANKER_PARAMS": {**config.MILVUS_RANKER_PARAMS, "k": recommended.rrf_k},
+        },
+        "effort_profiles": {
+            "low": pick_fastest(frontier, low_recall).as_effort_profile(),
+            "medium": {},
+            "high": frontier[-1].as_effort_profile(),
+        },
+    }
+
+
+async def autotune(args: argparse.Namespace) -> Optional[Dict[str, Any]]:
+    if not setup_milvus_database():
+        logger.error("Could not connect to Milvus")
+        return None
+    if not await get_vector_store():
+        logger.error("Could not initialise vector store")
+        return None
+
+    corpus_texts = load_corpus(config.MILVUS_COLLECTION_NAME)
+    if not corpus_texts:
+        logger.error(f"Collection '{config.MILVUS_COLLECTION_NAME}' is empty; ingest documents first")
+        return None
+
+    rng = random.Random(args.seed)
+    sampled = rng.sample(corpus_texts, min(args.sample_chunks, len(corpus_texts)))
+    queries, truth = build_ground_truth(load_eval_set(args.questions), sampled, corpus_texts, args.chunk_query_chars)
+    print(f"Ground truth built for {len(queries)} queries over {len(corpus_texts)} chunks")
+
+    embedder = get_query_embedding_model()
+    query_vectors = {query: await embedder.aembed_query(query) for query in queries}
+
+    grid = [
+        combo for combo in itertools.product(args.ef, args.fetch_k, args.drop_ratio, args.rrf_k)
+        if combo[1] >= args.k and combo[0] >= combo[1]  # HNSW requires ef >= limit
+    ]
+    results: List[TrialResult] = []
+    for index, (ef, fetch_k, drop_ratio, rrf_k) in enumerate(grid, start=1):
+        # Warm up caches for this combination before timing it
+        await run_trial(queries[:1], query_vectors, truth[:1], ef, fetch_k, drop_ratio, rrf_k, args.k, 1)
+        result = await run_trial(queries, query_vectors, truth, ef, fetch_k, drop_ratio, rrf_k, args.k, args.repeats)
+        results.append(result)
+        print(
+            f"[{index}/{len(grid)}] ef={ef} fetch_k={fetch_k} drop_ratio={drop_ratio} rrf_k={rrf_k}: "
+            f"recall@{args.k}={result.recall:.3f} p95={result.p95_ms:.1f}ms"
+        )
+
+    if not results:
+        logger.error("Parameter grid is empty after filtering ef >= fetch_k >= k")
+        return None
+
+    frontier = pareto_frontier(results)
+    recommended = pick_fastest(frontier, args.target_recall)
+    profile = build_profile(recommended, frontier, args.low_recall, args.target_recall)
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    write_results(results, frontier, args.output_dir)
+    plot_frontier(results, frontier, os.path.join(args.output_dir, "frontier.png"))
+    profile_path = os.path.join(args.output_dir, "search_profile.json")
+    with open(profile_path, "w", encoding="utf-8") as f:
+        json.dump(profile, f, indent=2)
+
+    print("Pareto frontier (p95 ms -> recall):")
+    for r in frontier:
+        print(f"  {r.p95_ms:8.1f} ms  recall={r.recall:.3f}  ef={r.ef} fetch_k={r.fetch_k} drop_ratio={r.drop_ratio_search} rrf_k={r.rrf_k}")
+    print(f"Recommended profile written to {profile_path}; set MILVUS_SEARCH_PROFILE={profile_path} to use it")
+    return profile
+
+
+def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Sweep hybrid search parameters for recall vs latency.")
+    parser.add_argument("--output-dir", default="tuning", help="Directory for CSV/JSON results, plot and profile")
+    parser.add_argument("--questions", default=EVAL_QUESTIONS_PATH, help="Eval questions JSONL")
+    parser.add_argument("--sample-chunks", type=int, default=50, help="Chunks sampled as extra queries")
+    parser.add_argument("--chunk-query-chars", type=int, default=200, help="Prefix length of sampled chunk queries")
+    parser.add_argument("--k", type=int, default=config.RAG_TOP_K, help="Recall is measured at this k")
+    parser.add_argument("--ef", type=int, nargs="+", default=[32, 64, 128, 250, 500])
+    parser.add_argument("--fetch-k", type=int, nargs="+", default=[10, 20, 50, 100])
+    parser.add_argument("--drop-ratio", type=float, nargs="+", default=[0.0, 0.2, 0.4])
+    parser.add_argument("--rrf-k", type=int, nargs="+", default=[10, 60, 100])
+    parser.add_argument("--repeats", type=int, default=3, help="Timed passes over the query set per combination")
+    parser.add_argument("--target-recall", type=float, default=0.95, help="Recall the default profile must reach")
+    parser.add_argument("--low-recall", type=float, default=0.8, help="Recall the 'low' effort preset must reach")
+    parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    logging.basicConfig(level=logging.WARNING, format=config.LOG_FORMAT)
+    asyncio.run(autotune(parse_args(argv)))
+
+
+if __name__ == "__main__":
+    main()
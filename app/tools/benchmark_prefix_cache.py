@@ -0,0 +1,180 @@
+"""
+Benchmark prefix-cache reuse of the ask prompt across the eval set.
+
+For every eval question the retrieved chunks are rendered twice: with the
+legacy layout (ChatPromptTemplate system message with interpolated context,
+then context and question repeated in the human message) and with the current
+layout from app.utils.prompts (static prefix, canonical context, question last).
+For each layout it reports the prompt tokens that a vLLM-style block prefix
+cache would reuse, the prefill tokens left to compute, and time-to-first-token
+measured by streaming each prompt from the LLM.
+
+Usage:
+    python -m app.tools.benchmark_prefix_cache --stub          # stub backends, simulated prefill cost
+    python -m app.tools.benchmark_prefix_cache --tokenizer hf  # configured Milvus/vLLM, model tokenizer
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import time
+from contextlib import aclosing
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+from langchain_core.documents import Document
+
+from app.config.config import config
+from app.rag.retriever import retrieve_documents
+from app.tools.autotune_search import EVAL_QUESTIONS_PATH, load_eval_questions
+from app.tools.stub_backends import PrefixCacheSimulator, StubLLMServer, pseudo_tokenize, start_stub_stack
+from app.utils.embedding_utils import initialize_query_embedding_model
+from app.utils.llm_utils import get_llm_router
+from app.utils.milvus_utils import get_vector_store, setup_milvus_database
+from app.utils.prompts import build_prompt
+from app.utils.rag_utils import prepare_document_context
+
+logger = logging.getLogger(__name__)
+
+# Prompt layout before the prefix-cache rework, kept here only for comparison
+LEGACY_SYSTEM_TEMPLATE = """
+You are an expert assistant. Given a user question and context, answer it along with citations for each source.
+Answer strictly in this JSON format:
+{{"answer": "<string>", "category": "<api|security|pricing|support|other>", "confidence": <float 0-1>, "sources": [{{"doc": "<document_name>", "snippet": "<source_snippet>"}}]}}
+"Context: {context}\\nUser Question: {question}\\nJSON Output:"
+"""
+
+
+def legacy_context(docs: List[Document]) -> str:
+    """Context as formatted before the rework: retrieval order, trailing spaces."""
+    parts, seen = [], set()
+    for doc in docs:
+        if doc.page_content in seen:
+            continue
+        seen.add(doc.page_content)
+        m = doc.metadata
+        parts.append(
+            f"document_name: {m.get('document_name', '')} \n"
+            f"section_name: {m.get('section_name', '')} \n"
+            f"heading: {m.get('heading', '')} \n"
+            f"sub_heading: {m.get('sub_heading', '')} \n"
+            f"page_content: {doc.page_content} \n"
+        )
+    return "\n\n".join(parts)
+
+
+def legacy_prompt(docs: List[Document], question: str) -> str:
+    """String the completion LLM received from the legacy two-message ChatPromptTemplate."""
+    context = legacy_context(docs)
+    system = LEGACY_SYSTEM_TEMPLATE.replace("{{", "{").replace("}}", "}")
+    system = system.replace("{context}", context).replace("{question}", question)
+    human = f"Context: {context}\nUser Question: {question}\nJSON Output:"
+    return f"System: {system}\nHuman: {human}"
+
+
+def get_tokenizer(kind: str) -> Callable[[str], Sequence[Any]]:
+    if kind == "hf":
+        from transformers import AutoTokenizer
+        tokenizer = AutoTokenizer.from_pretrained(config.LLM_MODEL_NAME)
+        return lambda text: tokenizer.encode(text, add_special_tokens=False)
+    return pseudo_tokenize
+
+
+async def measure_ttft(prompt: str) -> float:
+    """Milliseconds until the first streamed chunk; the stream is closed right after so the generation is aborted."""
+    started = time.perf_counter()
+    async with aclosing(get_llm_router().astream(prompt)) as stream:
+        async for _ in stream:
+            break
+    return (time.perf_counter() - started) * 1000
+
+
+async def setup_backends(args: argparse.Namespace) -> List[Any]:
+    """Start stub servers if requested (returned so they can be stopped), else connect to real services."""
+    if not args.stub:
+        if not setup_milvus_database():
+            raise RuntimeError("Could not connect to Milvus")
+        await initialize_query_embedding_model()
+        if not await get_vector_store():
+            raise RuntimeError("Could not initialise vector store")
+        return []
+
+    return await start_stub_stack(llm=StubLLMServer(
+        output_tokens=5,
+        prefill_token_latency=args.stub_prefill_ms / 1000,
+        prefix_cache=PrefixCacheSimulator(args.block_size),
+    ))
+
+
+async def benchmark(args: argparse.Namespace) -> Dict[str, Any]:
+    servers = await setup_backends(args)
+    tokenize = get_tokenizer(args.tokenizer)
+    try:
+        prompts: Dict[str, List[str]] = {"legacy": [], "prefix_cached": []}
+        for question in load_eval_questions(args.questions):
+            docs = await retrieve_documents(question, k=config.RAG_TOP_K)
+            prompts["legacy"].append(legacy_prompt(docs, question))
+            prompts["prefix_cached"].append(build_prompt(await prepare_document_context(docs), question))
+
+        report: Dict[str, Any] = {"tokenizer": args.tokenizer, "block_size": args.block_size, "layouts": {}}
+        for layout, layout_prompts in prompts.items():
+            cache = PrefixCacheSimulator(args.block_size)
+            total = cached = 0
+            for prompt in layout_prompts:
+                tokens = list(tokenize(prompt))
+                total += len(tokens)
+                cached += cache.lookup_and_insert(tokens)
+
+            stats: Dict[str, Any] = {
+                "prompts": len(layout_prompts),
+                "prompt_tokens": total,
+                "cached_tokens": cached,
+                "prefill_tokens": total - cached,
+                "cache_hit_ratio": cached / total if total else 0.0,
+            }
+            if not args.skip_ttft:
+                ttfts = np.asarray([await measure_ttft(prompt) for prompt in layout_prompts])
+                stats.update({
+                    "ttft_mean_ms": float(ttfts.mean()),
+                    "ttft_p50_ms": float(np.percentile(ttfts, 50)),
+                    "ttft_p95_ms": float(np.percentile(ttfts, 95)),
+                })
+            report["layouts"][layout] = stats
+
+        legacy, current = report["layouts"]["legacy"], report["layouts"]["prefix_cached"]
+        report["prefill_tokens_saved"] = legacy["prefill_tokens"] - current["prefill_tokens"]
+        report["prefill_tokens_saved_ratio"] = (
+            report["prefill_tokens_saved"] / legacy["prefill_tokens"] if legacy["prefill_tokens"] else 0.0
+        )
+    finally:
+        for server in servers:
+            await server.stop()
+
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(json.dumps(report, indent=2))
+    return report
+
+
+def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Measure prompt prefix-cache reuse and TTFT on the eval set.")
+    parser.add_argument("--questions", default=EVAL_QUESTIONS_PATH)
+    parser.add_argument("--stub", action="store_true", help="Use stub embedding, vector store and LLM backends")
+    parser.add_argument("--stub-prefill-ms", type=float, default=0.5, help="Stub prefill cost per uncached token")
+    parser.add_argument("--tokenizer", choices=["pseudo", "hf"], default="pseudo",
+                        help="Token accounting: word/punctuation approximation or the LLM's HF tokenizer")
+    parser.add_argument("--block-size", type=int, default=16, help="vLLM KV cache block size")
+    parser.add_argument("--skip-ttft", action="store_true", help="Only count tokens, do not call the LLM")
+    parser.add_argument("--output", default="benchmarks/prefix_cache_benchmark.json")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    logging.basicConfig(level=logging.WARNING, format=config.LOG_FORMAT)
+    asyncio.run(benchmark(parse_args(argv)))
+
+
+if __name__ == "__main__":
+    main()
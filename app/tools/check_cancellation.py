@@ -0,0 +1,136 @@
+"""
+Check that abandoned /api/ask requests free their LLM slot within a bounded time.
+
+Serves the real app with uvicorn against stub embedding, vector store and LLM
+backends. Each trial starts a request, waits until the stub LLM is generating,
+then either closes the client connection or lets the request deadline expire.
+It measures how long the LLM slot stays busy afterwards. Exits non-zero if any
+trial exceeds the bound.
+
+Usage:
+    python -m app.tools.check_cancellation --trials 5 --max-free-delay 1.0
+"""
+import argparse
+import asyncio
+import json
+import logging
+import sys
+import time
+from typing import List, Optional, Sequence
+
+import uvicorn
+
+from app.config.config import config
+from app.tools.stub_backends import StubLLMServer, free_port, preserved_app_state, start_stub_stack
+
+logger = logging.getLogger(__name__)
+
+QUESTION = "What are the rate limits on Pro and do 429s include retry hints?"
+
+
+async def _wait_for(predicate, timeout: float, interval: float = 0.01) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        await asyncio.sleep(interval)
+    return predicate()
+
+
+async def _send_ask(port: int, body: dict):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    payload = json.dumps(body).encode()
+    writer.write(
+        f"POST /api/ask HTTP/1.1\r\nHost: 127.0.0.1\r\nContent-Type: application/json\r\n"
+        f"Content-Length: {len(payload)}\r\n\r\n".encode() + payload
+    )
+    await writer.drain()
+    return reader, writer
+
+
+async def run_trial(port: int, llm: StubLLMServer, mode: str, deadline_ms: int, start_timeout: float) -> Optional[float]:
+    """Abandon one request; return seconds from abandonment until the LLM slot was freed."""
+    aborted_before = len(llm.aborted_at)
+    body = {"question": QUESTION, "deadline_ms": deadline_ms if mode == "deadline" else None}
+    reader, writer = await _send_ask(port, body)
+
+    if not await _wait_for(lambda: llm.active > 0, start_timeout):
+        writer.close()
+        logger.error("LLM generation never started")
+        return None
+
+    if mode == "disconnect":
+        abandoned_at = time.monotonic()
+        writer.close()
+    else:
+        status_line = await reader.readline()
+        abandoned_at = time.monotonic()
+        writer.close()
+        if b"504" not in status_line:
+            logger.error(f"Expected 504 for expired deadline, got {status_line!r}")
+            return None
+
+    if not await _wait_for(lambda: len(llm.aborted_at) > aborted_before, timeout=30):
+        return None
+    # For deadlines the slot is freed before the 504 is written, so the delay is clamped to 0
+    return max(0.0, llm.aborted_at[-1] - abandoned_at)
+
+
+async def check(args: argparse.Namespace) -> bool:
+    # Runs inside pytest too, so the stubs and config changes must not outlive the check
+    with preserved_app_state():
+        llm = StubLLMServer(token_latency=lambda: 0.05, output_tokens=args.output_tokens)
+        servers = await start_stub_stack(llm=llm)
+        config.FAQ_FAST_PATH_ENABLED = False  # Every question must reach the LLM
+
+        from app.main import create_app
+        port = free_port()
+        server = uvicorn.Server(uvicorn.Config(create_app(), host="127.0.0.1", port=port, lifespan="off", log_level="warning"))
+        serve_task = asyncio.create_task(server.serve())
+        await _wait_for(lambda: server.started, timeout=10)
+
+        ok = True
+        try:
+            for mode in ("disconnect", "deadline"):
+                delays: List[float] = []
+                for _ in range(args.trials):
+                    delay = await run_trial(port, llm, mode, args.deadline_ms, start_timeout=10)
+                    if delay is None:
+                        ok = False
+                        print(f"{mode}: trial failed (slot not freed or unexpected response)")
+                        continue
+                    delays.append(delay)
+                if delays:
+                    worst = max(delays)
+                    passed = worst <= args.max_free_delay
+                    ok = ok and passed
+                    print(f"{mode}: {len(delays)} trials, worst slot-free delay {worst * 1000:.0f} ms "
+                          f"(bound {args.max_free_delay * 1000:.0f} ms) -> {'PASS' if passed else 'FAIL'}")
+            ok = ok and await _wait_for(lambda: llm.active == 0, timeout=5)
+            ok = ok and llm.completed == 0  # Every generation was abandoned, so none may run to the end
+            print(f"LLM generations in flight after trials: {llm.active}; completed: {llm.completed}")
+        finally:
+            server.should_exit = True
+            await serve_task
+            for stub in servers:
+                await stub.stop()
+        return ok
+
+
+def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Verify abandoned /api/ask requests free their LLM slot.")
+    parser.add_argument("--trials", type=int, default=5)
+    parser.add_argument("--output-tokens", type=int, default=400, help="Stub generation length (50 ms per token)")
+    parser.add_argument("--deadline-ms", type=int, default=1500)
+    parser.add_argument("--max-free-delay", type=float, default=config.DISCONNECT_POLL_INTERVAL + 0.5,
+                        help="Seconds an abandoned request may keep its LLM slot")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    logging.basicConfig(level=logging.WARNING, format=config.LOG_FORMAT)
+    sys.exit(0 if asyncio.run(check(parse_args(argv))) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+"""
+Check multi-endpoint LLM routing against stub vLLM replicas.
+
+Runs four scenarios with local StubLLMServer instances and LLMRouter:
+
+    balancing  two fast replicas and one slow one under concurrent load; the
+               slow replica must receive well under a third of the traffic
+    breaker    one replica is stopped; every request must still succeed, the
+               dead replica is ejected after LLM_CIRCUIT_FAILURE_THRESHOLD
+               failures, and it gets traffic again after it comes back
+    hedging    two replicas whose first token is occasionally very slow; tail
+               latency with hedging must beat tail latency without it, and the
+               losing duplicates must be aborted
+    deadlines  two healthy replicas; requests whose own budget is shorter than
+               the first token must time out without opening any breaker, while
+               the replicas' own request timeout still does
+
+Exits non-zero if any scenario fails.
+
+Usage:
+    python -m app.tools.check_llm_routing --requests 200
+"""
+import argparse
+import asyncio
+import logging
+import random
+import sys
+import time
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from app.config.config import config
+from app.tools.stub_backends import StubLLMServer
+from app.utils.llm_utils import LLMRouter
+from app.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+PROMPT = "Context:\nstub\n\nUser Question: ping\nJSON Output:"
+
+
+def _const(value: float):
+    return lambda: value
+
+
+async def _start(servers: List[StubLLMServer]) -> List[str]:
+    return [await server.start() for server in servers]
+
+
+async def _stop(servers: List[StubLLMServer]) -> None:
+    for server in servers:
+        await server.stop()
+
+
+async def _timed(router: LLMRouter, hedge: bool = False) -> float:
+    started = time.perf_counter()
+    await router.agenerate(PROMPT, timeout=10, hedge=hedge)
+    return time.perf_counter() - started
+
+
+async def check_balancing(args: argparse.Namespace) -> bool:
+    servers = [
+        StubLLMServer(first_token_latency=_const(0.05), token_latency=_const(0.01), output_tokens=5),
+        StubLLMServer(first_token_latency=_const(0.05), token_latency=_const(0.01), output_tokens=5),
+        StubLLMServer(first_token_latency=_const(0.4), token_latency=_const(0.01), output_tokens=5),
+    ]
+    router = LLMRouter(await _start(servers))
+    queue: asyncio.Queue = asyncio.Queue()
+    for _ in range(args.requests):
+        queue.put_nowait(None)
+
+    async def worker() -> None:
+        while not queue.empty():
+            queue.get_nowait()
+            await router.agenerate(PROMPT, timeout=10)
+
+    try:
+        await asyncio.gather(*[worker() for _ in range(args.concurrency)])
+    finally:
+        await _stop(servers)
+
+    shares = [server.completed / args.requests for server in servers]
+    passed = shares[2] < 0.25 and sum(s.completed for s in servers) == args.requests
+    print(f"balancing: shares fast/fast/slow = {shares[0]:.2f}/{shares[1]:.2f}/{shares[2]:.2f} "
+          f"-> {'PASS' if passed else 'FAIL'}")
+    return passed
+
+
+async def check_breaker(args: argparse.Namespace) -> bool:
+    servers = [StubLLMServer(first_token_latency=_const(0.01), token_latency=_const(0.005), output_tokens=5)
+               for _ in range(3)]
+    reset_timeout = 1.0
+    router = LLMRouter(await _start(servers), failure_threshold=config.LLM_CIRCUIT_FAILURE_THRESHOLD,
+                       reset_timeout=reset_timeout)
+    dead_server, dead = servers[2], router.endpoints[2]
+    failed_requests = 0
+    try:
+        await dead_server.stop()
+        started = time.monotonic()
+        for _ in range(args.requests // 4):
+            try:
+                await router.agenerate(PROMPT, timeout=10)
+            except Exception as e:
+                failed_requests += 1
+                logger.error(f"Request failed with a replica down: {e}")
+        # Requests sent to the dead replica: the threshold plus one half-open probe per reset period
+        dead_attempts = int(metrics.get("llm_requests_total", endpoint=dead.base_url, outcome="failure"))
+        allowed = config.LLM_CIRCUIT_FAILURE_THRESHOLD + int((time.monotonic() - started) / reset_timeout) + 1
+        ejected = dead.opened_at is not None and dead_attempts <= allowed
+
+        await dead_server.start()  # Same port
+        await asyncio.sleep(reset_timeout)
+        served_before = dead_server.completed
+        for _ in range(args.requests // 4):
+            await router.agenerate(PROMPT, timeout=10)
+        recovered = dead.state == "closed" and dead_server.completed > served_before
+    finally:
+        await _stop(servers)
+
+    passed = failed_requests == 0 and ejected and recovered
+    print(f"breaker: {failed_requests} failed requests, {dead_attempts} requests hit the dead replica "
+          f"(allowed {allowed}), ejected={ejected}, recovered={recovered} -> {'PASS' if passed else 'FAIL'}")
+    return passed
+
+
+async def check_hedging(args: argparse.Namespace) -> bool:
+    rng = random.Random(args.seed)
+
+    def first_token_latency() -> float:
+        # Mostly fast, with a slow tail (e.g. a replica stalled on a long prefill)
+        return 0.5 if rng.random() < args.slow_fraction else 0.03
+
+    results: Dict[str, np.ndarray] = {}
+    aborted = hedges = 0
+    for hedging in (False, True):
+        servers = [StubLLMServer(first_token_latency=first_token_latency, token_latency=_const(0.005),
+                                 output_tokens=5) for _ in range(2)]
+        router = LLMRouter(await _start(servers), hedging_enabled=hedging,
+                           hedge_quantile=config.LLM_HEDGE_QUANTILE, hedge_min_samples=config.LLM_HEDGE_MIN_SAMPLES)
+        try:
+            latencies = [await _timed(router, hedge=True) for _ in range(args.requests)]
+            await asyncio.sleep(0.1)  # Let cancelled losers register their abort
+        finally:
+            await _stop(servers)
+        results["hedged" if hedging else "unhedged"] = np.asarray(latencies[config.LLM_HEDGE_MIN_SAMPLES:]) * 1000
+        if hedging:
+            aborted = sum(len(server.aborted_at) for server in servers)
+            hedges = sum(server.requests for server in servers) - args.requests
+
+    for name, values in results.items():
+        print(f"hedging ({name}): p50 {np.percentile(values, 50):.0f} ms, p95 {np.percentile(values, 95):.0f} ms, "
+              f"p99 {np.percentile(values, 99):.0f} ms")
+    passed = (np.percentile(results["hedged"], 99) < np.percentile(results["unhedged"], 99)
+              and aborted >= hedges * 0.9)
+    print(f"hedging: {hedges} duplicates sent ({hedges / args.requests:.1%}), {aborted} losers aborted "
+          f"-> {'PASS' if passed else 'FAIL'}")
+    return passed
+
+
+async def check_deadlines(args: argparse.Namespace) -> bool:
+    threshold = config.LLM_CIRCUIT_FAILURE_THRESHOLD
+    servers = [StubLLMServer(first_token_latency=_const(0.3), token_latency=_const(0.005), output_tokens=5)
+               for _ in range(2)]
+    router = LLMRouter(await _start(servers), failure_threshold=threshold, reset_timeout=60.0, request_timeout=10.0)
+    # Same replicas, but the endpoints' own timeout is shorter than the first token
+    strict = LLMRouter(router.base_urls, failure_threshold=threshold, reset_timeout=60.0, request_timeout=0.05)
+    timed_out = 0
+    try:
+        for _ in range(threshold * len(servers)):
+            try:
+                await router.agenerate(PROMPT, timeout=0.05)
+            except Exception:
+                timed_out += 1
+        closed = all(endpoint.state == "closed" for endpoint in router.endpoints)
+        try:
+            await router.agenerate(PROMPT, timeout=10)
+            served = True
+        except Exception as e:
+            logger.error(f"Request with a full budget failed after short-deadline requests: {e}")
+            served = False
+
+        for _ in range(threshold * len(servers)):
+            try:
+                await strict.agenerate(PROMPT, timeout=10)
+            except Exception:
+                pass
+        ejected = all(endpoint.state == "open" for endpoint in strict.endpoints)
+    finally:
+        await _stop(servers)
+
+    passed = timed_out == threshold * len(servers) and closed and served and ejected
+    print(f"deadlines: {timed_out} short-budget requests timed out, breakers closed={closed}, "
+          f"full-budget request served={served}, endpoint timeouts eject={ejected} -> {'PASS' if passed else 'FAIL'}")
+    return passed
+
+
+async def check(args: argparse.Namespace) -> bool:
+    results = []
+    for scenario in args.scenarios:
+        results.append(await {"balancing": check_balancing, "breaker": check_breaker,
+                              "hedging": check_hedging, "deadlines": check_deadlines}[scenario](args))
+    return all(results)
+
+
+def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Verify LLM load balancing, circuit breaking and hedging.")
+    parser.add_argument("--requests", type=int, default=200, help="Requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=9, help="Concurrent clients in the balancing scenario")
+    parser.add_argument("--slow-fraction", type=float, default=0.08, help="Share of slow first tokens when hedging")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--scenarios", nargs="+", choices=["balancing", "breaker", "hedging", "deadlines"],
+                        default=["balancing", "breaker", "hedging", "deadlines"])
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    logging.basicConfig(level=logging.ERROR, format=config.LOG_FORMAT)
+    sys.exit(0 if asyncio.run(check(parse_args(argv))) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Evaluate the ask pipeline on the eval question set.
+
+Runs every question in eval_questions.jsonl through process_query and reports
+category accuracy, expected-substring accuracy and latency, broken down by
+answer path so the FAQ fast-path hit rate and its accuracy can be monitored.
+
+Usage:
+    python -m app.tools.evaluate --output eval_results.json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+from app.config.config import config
+from app.src.workflow import process_query
+from app.tools.autotune_search import EVAL_QUESTIONS_PATH
+from app.utils.embedding_utils import initialize_query_embedding_model
+from app.utils.milvus_utils import get_vector_store, setup_milvus_database
+
+logger = logging.getLogger(__name__)
+
+
+def load_eval_set(path: str = EVAL_QUESTIONS_PATH) -> List[Dict[str, Any]]:
+    """Load eval records (question, expected_category, expected_contains)."""
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def score_answer(record: Dict[str, Any], answer: Dict[str, Any]) -> Dict[str, Any]:
+    """Compare one answer with its eval record."""
+    text = answer.get("answer", "")
+    expected = record.get("expected_contains", [])
+    found = [needle for needle in expected if needle.lower() in text.lower()]
+    return {
+        "category_correct": answer.get("category") == record.get("expected_category"),
+        "contains_all": len(found) == len(expected),
+        "contains_ratio": len(found) / len(expected) if expected else 1.0,
+    }
+
+
+def summarise(rows: Sequence[Dict[str, Any]]) -> Dict[str, Any]:
+    """Aggregate accuracy and latency overall and per answer path."""
+    def aggregate(subset: Sequence[Dict[str, Any]]) -> Dict[str, Any]:
+        ok = [row for row in subset if "error" not in row]
+        if not ok:
+            return {"count": len(subset), "errors": len(subset)}
+        latencies = sorted(row["latency_ms"] for row in ok)
+        return {
+            "count": len(subset),
+            "errors": len(subset) - len(ok),
+            "category_accuracy": sum(row["category_correct"] for row in ok) / len(ok),
+            "contains_accuracy": sum(row["contains_all"] for row in ok) / len(ok),
+            "mean_latency_ms": sum(latencies) / len(latencies),
+            "p95_latency_ms": latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))],
+        }
+
+    paths = sorted({row.get("answer_path", "error") for row in rows})
+    return {
+        "overall": aggregate(rows),
+        "by_path": {path: aggregate([row for row in rows if row.get("answer_path", "error") == path]) for path in paths},
+        "faq_fast_path_hit_rate": sum(row.get("answer_path") == "faq_fast_path" for row in rows) / max(len(rows), 1),
+    }
+
+
+async def evaluate(args: argparse.Namespace) -> Optional[Dict[str, Any]]:
+    if not setup_milvus_database():
+        logger.error("Could not connect to Milvus")
+        return None
+    await initialize_query_embedding_model()
+    if not await get_vector_store():
+        logger.error("Could not initialise vector store")
+        return None
+
+    rows: List[Dict[str, Any]] = []
+    for record in load_eval_set(args.questions):
+        trace: Dict[str, Any] = {}
+        started = time.perf_counter()
+        try:
+            answer = await process_query(record["question"], search_effort=args.search_effort, trace=trace)
+        except Exception as e:
+            logger.error(f"Question failed: {record['question']}: {e}")
+            rows.append({"question": record["question"], "error": str(e)})
+            continue
+        answer = answer.model_dump()
+        rows.append({
+            "question": record["question"],
+            "latency_ms": (time.perf_counter() - started) * 1000,
+            "answer": answer,
+            **trace,
+            **score_answer(record, answer),
+        })
+
+    report = {"config": {"llm_model": config.LLM_MODEL_NAME, "search_effort": args.search_effort},
+              "summary": summarise(rows), "results": rows}
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(json.dumps(report["summary"], indent=2))
+    return report
+
+
+def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Evaluate /api/ask answers on the eval question set.")
+    parser.add_argument("--questions", default=EVAL_QUESTIONS_PATH, help="Eval questions JSONL")
+    parser.add_argument("--output", default="eval_results.json", help="Where to write per-question results")
+    parser.add_argument("--search-effort", default=None, help="Search effort preset to evaluate")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    logging.basicConfig(level=logging.WARNING, format=config.LOG_FORMAT)
+    asyncio.run(evaluate(parse_args(argv)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,392 @@
+"""
+Load-test /api/ask and /ingest and record saturation curves.
+
+Drives the app at stepped load levels and reports, per step and endpoint,
+offered load (requests sent / step duration), achieved throughput (completions
+/ elapsed time including the drain), latency percentiles, error / shed (429) /
+timeout rates, answer paths and per-stage timings (read from the Server-Timing
+header).
+
+Load models:
+    open    Poisson arrivals at each rate in --rates (req/s). Latency is measured
+            from the scheduled arrival time, so a stalled server cannot hide
+            its backlog (no coordinated omission).
+    closed  --concurrency clients, each sending its next request as soon as the
+            previous one finishes.
+
+Targets:
+    asgi    the app in-process through httpx's ASGI transport (default)
+    http    the app served by uvicorn on a local port
+    --url   an already running server; no stubs are installed
+
+With asgi/http the app runs against stub Milvus, embedding and LLM backends
+(app/tools/stub_backends.py) whose latencies are set with spec strings, e.g.
+"const:0.01", "uniform:0.01,0.05", "exp:0.05", "lognormal:0.3,0.4". The load
+generator shares the app's event loop in these modes; use --url against a
+separate process for the most faithful absolute numbers.
+
+Writes steps.json, steps.csv and (if matplotlib is installed) saturation.png
+to --output-dir, and prints the highest load level that kept /api/ask within
+--slo-p99-ms.
+
+Usage:
+    python -m app.tools.loadtest --mode open --rates 2,4,8,16 --step-duration 20
+    python -m app.tools.loadtest --mode closed --concurrency 1,4,16 --ingest-ratio 0.05
+    python -m app.tools.loadtest --url http://localhost:8098 --rates 1,2,4
+"""
+import argparse
+import asyncio
+import csv
+import json
+import logging
+import os
+import random
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence
+
+import httpx
+import numpy as np
+import uvicorn
+
+from app.config.config import config
+from app.tools.autotune_search import EVAL_QUESTIONS_PATH, load_eval_questions
+from app.tools.stub_backends import (
+    DATASET_DIR,
+    StubEmbeddingServer,
+    StubLLMServer,
+    free_port,
+    parse_latency,
+    start_stub_stack,
+)
+from app.utils.timing import parse_server_timing
+
+logger = logging.getLogger(__name__)
+
+PERCENTILES = (50, 90, 95, 99)
+
+
+@dataclass
+class RequestResult:
+    endpoint: str
+    latency_ms: float
+    status: int  # 0 when the request failed without an HTTP response
+    answer_path: Optional[str] = None
+    timings: Dict[str, float] = field(default_factory=dict)
+    error: Optional[str] = None
+
+    @property
+    def outcome(self) -> str:
+        if 200 <= self.status < 300:
+            return "ok"
+        if self.status == 429:
+            return "shed"
+        if self.status == 504 or self.error == "client_timeout":
+            return "timeout"
+        return "error"
+
+
+class Workload:
+    """Builds /api/ask and /ingest requests and records their results."""
+
+    def __init__(self, client: httpx.AsyncClient, args: argparse.Namespace, rng: random.Random):
+        self.client = client
+        self.args = args
+        self.rng = rng
+        self.questions = load_eval_questions(args.questions)
+        self.files = [
+            (name, open(os.path.join(DATASET_DIR, name), "rb").read())
+            for name in sorted(os.listdir(DATASET_DIR)) if name.endswith(".md")
+        ]
+
+    async def send(self, scheduled: Optional[float] = None) -> RequestResult:
+        """Send one request; latency runs from `scheduled` (perf_counter) if given, else from now."""
+        started = scheduled if scheduled is not None else time.perf_counter()
+        endpoint = "ingest" if self.rng.random() < self.args.ingest_ratio else "ask"
+        try:
+            if endpoint == "ask":
+                body: Dict[str, Any] = {"question": self.rng.choice(self.questions), "priority": self.args.priority}
+                if self.args.deadline_ms:
+                    body["deadline_ms"] = self.args.deadline_ms
+                response = await self.client.post("/api/ask", json=body)
+            else:
+                name, content = self.rng.choice(self.files)
+                response = await self.client.post("/ingest", files={"file": (name, content, "text/markdown")})
+        except httpx.TimeoutException:
+            return RequestResult(endpoint, (time.perf_counter() - started) * 1000, 0, error="client_timeout")
+        except httpx.HTTPError as e:
+            return RequestResult(endpoint, (time.perf_counter() - started) * 1000, 0, error=type(e).__name__)
+
+        return RequestResult(
+            endpoint,
+            (time.perf_counter() - started) * 1000,
+            response.status_code,
+            answer_path=response.headers.get("X-Answer-Path"),
+            timings=parse_server_timing(response.headers.get("Server-Timing", "")),
+        )
+
+
+async def run_open_step(workload: Workload, rate: float, duration: float) -> List[RequestResult]:
+    """Poisson arrivals at `rate` req/s for `duration` seconds; waits for every request to finish."""
+    tasks = []
+    start = time.perf_counter()
+    offset = workload.rng.expovariate(rate)
+    while offset < duration:
+        await asyncio.sleep(max(0.0, start + offset - time.perf_counter()))
+        tasks.append(asyncio.ensure_future(workload.send(scheduled=start + offset)))
+        offset += workload.rng.expovariate(rate)
+    return list(await asyncio.gather(*tasks))
+
+
+async def run_closed_step(workload: Workload, concurrency: int, duration: float) -> List[RequestResult]:
+    """`concurrency` clients back to back for `duration` seconds."""
+    end = time.perf_counter() + duration
+    results: List[RequestResult] = []
+
+    async def client_loop() -> None:
+        while time.perf_counter() < end:
+            results.append(await workload.send())
+
+    await asyncio.gather(*[client_loop() for _ in range(concurrency)])
+    return results
+
+
+def _percentile(values: Sequence[float], q: float) -> Optional[float]:
+    return float(np.percentile(values, q)) if len(values) else None
+
+
+def summarise_step(
+    mode: str,
+    level: float,
+    duration: float,
+    elapsed: float,
+    results: List[RequestResult]
+) -> List[Dict[str, Any]]:
+    """
+    One row per endpoint: rates, latency percentiles, outcome rates, answer paths and stage timings.
+
+    Offered load is requests sent over the step `duration` (the arrival window).
+    Achieved throughput is completions over `elapsed`, which also covers draining
+    the requests still in flight when arrivals stopped.
+    """
+    rows = []
+    for endpoint in sorted({result.endpoint for result in results}):
+        subset = [result for result in results if result.endpoint == endpoint]
+        ok = [result for result in subset if result.outcome == "ok"]
+        latencies = [result.latency_ms for result in ok]
+        row: Dict[str, Any] = {
+            "mode": mode,
+            "level": level,
+            "endpoint": endpoint,
+            "requests": len(subset),
+            "ok": len(ok),
+            "duration_s": duration,
+            "elapsed_s": elapsed,
+            "offered_rps": len(subset) / duration,
+            "achieved_rps": len(subset) / elapsed,
+            "throughput_rps": len(ok) / elapsed,
+        }
+        for q in PERCENTILES:
+            row[f"latency_p{q}_ms"] = _percentile(latencies, q)
+        row["latency_max_ms"] = max(latencies) if latencies else None
+        for outcome in ("error", "shed", "timeout"):
+            row[f"{outcome}_rate"] = sum(result.outcome == outcome for result in subset) / len(subset)
+        for path in sorted({result.answer_path for result in ok if result.answer_path}):
+            row[f"path_{path}"] = sum(result.answer_path == path for result in ok)
+        stages = sorted({stage for result in ok for stage in result.timings})
+        for stage in stages:
+            values = [result.timings[stage] for result in ok if stage in result.timings]
+            row[f"stage_{stage}_mean_ms"] = float(np.mean(values))
+            row[f"stage_{stage}_p95_ms"] = _percentile(values, 95)
+        rows.append(row)
+    return rows
+
+
+def max_level_within_slo(rows: List[Dict[str, Any]], slo_p99_ms: float, max_failure_rate: float) -> Optional[Dict[str, Any]]:
+    """Highest /api/ask step whose p99 and error+shed+timeout rate stayed within bounds."""
+    passing = [
+        row for row in rows
+        if row["endpoint"] == "ask"
+        and row["latency_p99_ms"] is not None and row["latency_p99_ms"] <= slo_p99_ms
+        and row["error_rate"] + row["shed_rate"] + row["timeout_rate"] <= max_failure_rate
+    ]
+    return max(passing, key=lambda row: row["level"]) if passing else None
+
+
+def write_results(output_dir: str, report: Dict[str, Any]) -> None:
+    os.makedirs(output_dir, exist_ok=True)
+    with open(os.path.join(output_dir, "steps.json"), "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    rows = report["steps"]
+    fields: List[str] = []
+    for row in rows:
+        fields.extend(key for key in row if key not in fields)
+    with open(os.path.join(output_dir, "steps.csv"), "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=fields)
+        writer.writeheader()
+        writer.writerows(rows)
+    plot_saturation(rows, os.path.join(output_dir, "saturation.png"), report["config"]["slo_p99_ms"])
+
+
+def plot_saturation(rows: List[Dict[str, Any]], path: str, slo_p99_ms: float) -> None:
+    """Plot /api/ask throughput vs latency percentiles; skipped when matplotlib is not installed."""
+    try:
+        import matplotlib
+        matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+    except ImportError:
+        logger.warning("matplotlib is not installed; skipping saturation plot")
+        return
+
+    ask = [row for row in rows if row["endpoint"] == "ask" and row["ok"]]
+    if not ask:
+        return
+    fig, ax = plt.subplots(figsize=(8, 5))
+    throughput = [row["throughput_rps"] for row in ask]
+    for q in PERCENTILES:
+        ax.plot(throughput, [row[f"latency_p{q}_ms"] for row in ask], marker="o", label=f"p{q}")
+    ax.axhline(slo_p99_ms, color="grey", linestyle="--", label="p99 SLO")
+    ax.set_xlabel("throughput (ok req/s)")
+    ax.set_ylabel("latency (ms)")
+    ax.set_yscale("log")
+    ax.set_title("/api/ask saturation")
+    ax.legend()
+    fig.tight_layout()
+    fig.savefig(path, dpi=120)
+    plt.close(fig)
+
+
+async def start_stubs(args: argparse.Namespace) -> List[Any]:
+    """Start stub backends with the configured latencies; returns the servers to stop."""
+    seed = args.seed
+    llms = [
+        StubLLMServer(
+            first_token_latency=parse_latency(args.llm_first_token, seed=seed + i),
+            token_latency=parse_latency(args.llm_token, seed=seed + 100 + i),
+            output_tokens=args.llm_output_tokens,
+        )
+        for i in range(args.llm_replicas)
+    ]
+    servers = await start_stub_stack(
+        llm=llms[0],
+        embedder=StubEmbeddingServer(latency=parse_latency(args.embedding_latency, seed=seed + 200)),
+        store_kwargs={
+            "latency": parse_latency(args.milvus_latency, seed=seed + 300),
+            "insert_latency": parse_latency(args.insert_latency, seed=seed + 400),
+        },
+    )
+    if len(llms) > 1:
+        config.LLM_API_BASES = [llms[0].base_url] + [await llm.start() for llm in llms[1:]]
+        servers.extend(llms[1:])
+    return servers
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    servers: List[Any] = []
+    uvicorn_server = serve_task = None
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+    timeout = httpx.Timeout(args.timeout)
+
+    if args.url:
+        client = httpx.AsyncClient(base_url=args.url, limits=limits, timeout=timeout)
+    else:
+        servers = await start_stubs(args)
+        from app.main import create_app
+        app = create_app()
+        if args.target == "asgi":
+            client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://loadtest",
+                                       limits=limits, timeout=timeout)
+        else:
+            port = free_port()
+            uvicorn_server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, lifespan="off",
+                                                           log_level="warning"))
+            serve_task = asyncio.ensure_future(uvicorn_server.serve())
+            while not uvicorn_server.started:
+                await asyncio.sleep(0.01)
+            client = httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=timeout)
+
+    levels = args.rates if args.mode == "open" else args.concurrency
+    rows: List[Dict[str, Any]] = []
+    try:
+        workload = Workload(client, args, random.Random(args.seed))
+        for level in levels:
+            started = time.perf_counter()
+            if args.mode == "open":
+                results = await run_open_step(workload, level, args.step_duration)
+            else:
+                results = await run_closed_step(workload, int(level), args.step_duration)
+            step_rows = summarise_step(args.mode, level, args.step_duration, time.perf_counter() - started, results)
+            rows.extend(step_rows)
+            for row in step_rows:
+                p99 = row["latency_p99_ms"]
+                print(f"{args.mode} {level:>6} {row['endpoint']:<6} offered {row['offered_rps']:6.2f}/s  "
+                      f"{row['throughput_rps']:7.2f} ok/s  "
+                      f"p50 {row['latency_p50_ms'] or 0:7.0f} ms  p99 {p99 or 0:7.0f} ms  "
+                      f"err {row['error_rate']:.1%}  shed {row['shed_rate']:.1%}  timeout {row['timeout_rate']:.1%}")
+    finally:
+        await client.aclose()
+        if uvicorn_server is not None:
+            uvicorn_server.should_exit = True
+            await serve_task
+        for server in servers:
+            await server.stop()
+
+    knee = max_level_within_slo(rows, args.slo_p99_ms, args.max_failure_rate)
+    report = {
+        "config": {key: value for key, value in vars(args).items()},
+        "max_level_within_slo": knee["level"] if knee else None,
+        "max_throughput_within_slo_rps": knee["throughput_rps"] if knee else None,
+        "steps": rows,
+    }
+    write_results(args.output_dir, report)
+    if knee:
+        print(f"Highest {args.mode}-loop level with /api/ask p99 <= {args.slo_p99_ms:.0f} ms: {knee['level']} "
+              f"({knee['throughput_rps']:.2f} ok req/s)")
+    else:
+        print(f"No step kept /api/ask p99 <= {args.slo_p99_ms:.0f} ms")
+    return report
+
+
+def _numbers(text: str) -> List[float]:
+    return [float(value) for value in text.split(",") if value.strip()]
+
+
+def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Load-test /api/ask and /ingest and record saturation curves.")
+    parser.add_argument("--mode", choices=["open", "closed"], default="open")
+    parser.add_argument("--rates", type=_numbers, default=[1, 2, 4, 8, 16], help="Open-loop arrival rates, req/s")
+    parser.add_argument("--concurrency", type=_numbers, default=[1, 2, 4, 8, 16], help="Closed-loop client counts")
+    parser.add_argument("--step-duration", type=float, default=20.0, help="Seconds of load per step")
+    parser.add_argument("--ingest-ratio", type=float, default=0.0, help="Share of requests sent to /ingest")
+    parser.add_argument("--priority", choices=["high", "normal", "low"], default="normal")
+    parser.add_argument("--deadline-ms", type=int, default=None)
+    parser.add_argument("--timeout", type=float, default=30.0, help="Client timeout per request, seconds")
+    parser.add_argument("--questions", default=EVAL_QUESTIONS_PATH)
+    parser.add_argument("--target", choices=["asgi", "http"], default="asgi")
+    parser.add_argument("--url", default=None, help="Test a running server instead (no stubs)")
+    parser.add_argument("--llm-first-token", default="lognormal:0.3,0.3")
+    parser.add_argument("--llm-token", default="const:0.02")
+    parser.add_argument("--llm-output-tokens", type=int, default=40)
+    parser.add_argument("--llm-replicas", type=int, default=1)
+    parser.add_argument("--embedding-latency", default="const:0.005")
+    parser.add_argument("--milvus-latency", default="lognormal:0.02,0.5")
+    parser.add_argument("--insert-latency", default="const:0.05", help="Blocking stub insert time per ingest")
+    parser.add_argument("--slo-p99-ms", type=float, default=2000.0)
+    parser.add_argument("--max-failure-rate", type=float, default=0.01, help="Error+shed+timeout rate allowed within SLO")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output-dir", default="loadtest_results")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    logging.basicConfig(level=logging.ERROR, format=config.LOG_FORMAT)
+    args = parse_args(argv)
+    if not args.url:
+        # The stub vector store has no Milvus connection behind it; collection stats calls fail by design
+        logging.getLogger("app.utils.milvus_utils").setLevel(logging.CRITICAL)
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
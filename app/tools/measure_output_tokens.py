@@ -0,0 +1,157 @@
+"""
+Measure LLM output tokens saved by building citations server-side.
+
+For every eval question the retrieved context is sent to the LLM twice: with
+the previous prompt, whose schema asks the model for `sources`, and with the
+current prompt from app.utils.prompts, after which sources are extracted from
+the retrieved chunks (app.rag.source_snippets). Reports completion tokens (as
+counted by the server), generation latency, and how often model-written
+citations name a document that was not retrieved.
+
+Usage:
+    python -m app.tools.measure_output_tokens --stub   # stub backends (stub model copies chunks into sources)
+    python -m app.tools.measure_output_tokens          # configured Milvus/vLLM
+"""
+import argparse
+import asyncio
+import json
+import logging
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from app.config.config import config
+from app.rag.retriever import retrieve_documents
+from app.rag.source_snippets import build_sources
+from app.tools.autotune_search import EVAL_QUESTIONS_PATH, load_eval_questions
+from app.tools.stub_backends import start_stub_stack
+from app.utils.embedding_utils import initialize_query_embedding_model
+from app.utils.llm_utils import get_llm_doc, get_llm_endpoints
+from app.utils.milvus_utils import get_vector_store, setup_milvus_database
+from app.utils.prompts import build_prompt
+from app.utils.rag_utils import prepare_document_context
+
+logger = logging.getLogger(__name__)
+
+# Prompt prefix before citations moved server-side, kept here only for comparison
+LEGACY_PROMPT_PREFIX = """You are an expert assistant. Given a user question and context, answer it along with citations for each source.
+Answer strictly in this JSON format:
+{"answer": "<string>", "category": "<api|security|pricing|support|other>", "confidence": <float 0-1>, "sources": [{"doc": "<document_name>", "snippet": "<source_snippet>"}]}
+"""
+
+
+def legacy_prompt(context: str, question: str) -> str:
+    return f"{LEGACY_PROMPT_PREFIX}\nContext:\n{context}\n\nUser Question: {question}\nJSON Output:"
+
+
+async def generate(prompt: str) -> Dict[str, Any]:
+    """Non-streaming generation, so the server reports exact completion token usage."""
+    llm = get_llm_doc(api_base=get_llm_endpoints()[0])
+    started = time.perf_counter()
+    result = await llm.agenerate([prompt])
+    latency_ms = (time.perf_counter() - started) * 1000
+    usage = (result.llm_output or {}).get("token_usage", {})
+    return {
+        "text": result.generations[0][0].text,
+        "completion_tokens": int(usage.get("completion_tokens", 0)),
+        "latency_ms": latency_ms,
+    }
+
+
+def parse_output(text: str) -> Dict[str, Any]:
+    try:
+        start, end = text.index("{"), text.rindex("}") + 1
+        return json.loads(text[start:end])
+    except ValueError:
+        return {}
+
+
+def hallucinated_citations(output: Dict[str, Any], retrieved: List[str]) -> int:
+    sources = output.get("sources") or []
+    return sum(1 for source in sources if isinstance(source, dict) and source.get("doc") not in retrieved)
+
+
+def summarise(rows: List[Dict[str, Any]], layout: str) -> Dict[str, Any]:
+    tokens = np.asarray([row[layout]["completion_tokens"] for row in rows], dtype=float)
+    latency = np.asarray([row[layout]["latency_ms"] for row in rows], dtype=float)
+    return {
+        "completion_tokens_total": int(tokens.sum()),
+        "completion_tokens_mean": float(tokens.mean()),
+        "completion_tokens_p95": float(np.percentile(tokens, 95)),
+        "latency_mean_ms": float(latency.mean()),
+        "latency_p95_ms": float(np.percentile(latency, 95)),
+        "hallucinated_citations": int(sum(row[layout]["hallucinated_citations"] for row in rows)),
+    }
+
+
+async def measure(args: argparse.Namespace) -> Dict[str, Any]:
+    servers: List[Any] = []
+    if args.stub:
+        servers = await start_stub_stack()
+    else:
+        if not setup_milvus_database():
+            raise RuntimeError("Could not connect to Milvus")
+        await initialize_query_embedding_model()
+        if not await get_vector_store():
+            raise RuntimeError("Could not initialise vector store")
+
+    rows: List[Dict[str, Any]] = []
+    try:
+        for question in load_eval_questions(args.questions):
+            docs = await retrieve_documents(question, k=config.RAG_TOP_K)
+            context = await prepare_document_context(docs)
+            retrieved = [doc.metadata.get("document_name", "") for doc in docs]
+            row: Dict[str, Any] = {"question": question}
+
+            for layout, prompt in (("llm_sources", legacy_prompt(context, question)),
+                                   ("server_sources", build_prompt(context, question))):
+                generated = await generate(prompt)
+                output = parse_output(generated["text"])
+                if layout == "server_sources":
+                    started = time.perf_counter()
+                    output["sources"] = [s.model_dump() for s in build_sources(str(output.get("answer", "")), docs)]
+                    generated["snippet_ms"] = (time.perf_counter() - started) * 1000
+                generated["hallucinated_citations"] = hallucinated_citations(output, retrieved)
+                generated["sources"] = output.get("sources", [])
+                del generated["text"]
+                row[layout] = generated
+            rows.append(row)
+    finally:
+        for server in servers:
+            await server.stop()
+
+    before, after = summarise(rows, "llm_sources"), summarise(rows, "server_sources")
+    saved = before["completion_tokens_total"] - after["completion_tokens_total"]
+    report = {
+        "questions": len(rows),
+        "llm_sources": before,
+        "server_sources": {
+            **after,
+            "snippet_extraction_mean_ms": float(np.mean([row["server_sources"]["snippet_ms"] for row in rows])),
+        },
+        "completion_tokens_saved": saved,
+        "completion_tokens_saved_ratio": saved / before["completion_tokens_total"] if before["completion_tokens_total"] else 0.0,
+        "rows": rows,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(json.dumps({key: value for key, value in report.items() if key != "rows"}, indent=2))
+    return report
+
+
+def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Compare output tokens with LLM-written vs server-side citations.")
+    parser.add_argument("--questions", default=EVAL_QUESTIONS_PATH)
+    parser.add_argument("--stub", action="store_true", help="Use stub embedding, vector store and LLM backends")
+    parser.add_argument("--output", default="output_tokens_report.json")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    logging.basicConfig(level=logging.WARNING, format=config.LOG_FORMAT)
+    asyncio.run(measure(parse_args(argv)))
+
+
+if __name__ == "__main__":
+    main()
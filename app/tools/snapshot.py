@@ -0,0 +1,280 @@
+"""
+Export and import the vector index as a versioned snapshot.
+
+A snapshot directory holds:
+    manifest.json   format version, embedding model, dimension, dtype, row count
+    vectors.npy     dense vectors, float32 or float16, one row per chunk
+    chunks.parquet  id, text, chunk_hash, metadata_json (chunks.jsonl without pyarrow)
+
+Import bulk-loads the stored vectors through the vector store's add_embeddings,
+so the embedding server is never called. Vectors are read memory-mapped and
+chunks are streamed in batches, so snapshots larger than RAM can be loaded.
+
+Usage:
+    python -m app.tools.snapshot export --output-dir snapshots --dtype float16
+    python -m app.tools.snapshot import snapshots/collection-20250801T120000Z
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+
+from app.config.config import config
+from app.utils.milvus_utils import (
+    count_collection_entities,
+    get_collection_field_names,
+    get_vector_store,
+    iterate_collection,
+    setup_milvus_database,
+)
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_FORMAT_VERSION = 1
+MANIFEST_FILE = "manifest.json"
+VECTORS_FILE = "vectors.npy"
+
+# Field names used by create_vector_store
+PRIMARY_FIELD = "pk"
+TEXT_FIELD = "text"
+DENSE_FIELD = "dense"
+SPARSE_FIELD = "sparse"  # Produced by the BM25 function on insert, never exported
+
+
+def compute_chunk_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class ChunkWriter:
+    """Writes chunk rows to Parquet when pyarrow is available, otherwise to JSONL."""
+
+    def __init__(self, snapshot_dir: str):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            self._pa = pa
+            self.format = "parquet"
+            self.file_name = "chunks.parquet"
+            schema = pa.schema([
+                ("id", pa.string()),
+                ("text", pa.string()),
+                ("chunk_hash", pa.string()),
+                ("metadata_json", pa.string()),
+            ])
+            self._writer = pq.ParquetWriter(os.path.join(snapshot_dir, self.file_name), schema, compression="zstd")
+        except ImportError:
+            self._pa = None
+            self.format = "jsonl"
+            self.file_name = "chunks.jsonl"
+            self._writer = open(os.path.join(snapshot_dir, self.file_name), "w", encoding="utf-8")
+
+    def write(self, rows: List[Dict[str, str]]) -> None:
+        if self._pa is not None:
+            self._writer.write_table(self._pa.Table.from_pylist(rows, schema=self._writer.schema))
+        else:
+            for row in rows:
+                self._writer.write(json.dumps(row, ensure_ascii=False) + "\n")
+
+    def close(self) -> None:
+        self._writer.close()
+
+
+def iterate_chunks(snapshot_dir: str, manifest: Dict[str, Any], batch_size: int) -> Iterator[List[Dict[str, str]]]:
+    """Stream chunk rows from a snapshot in batches."""
+    path = os.path.join(snapshot_dir, manifest["chunks_file"])
+    if manifest["chunks_format"] == "parquet":
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=batch_size):
+            yield batch.to_pylist()
+        return
+
+    batch: List[Dict[str, str]] = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            batch.append(json.loads(line))
+            if len(batch) == batch_size:
+                yield batch
+                batch = []
+    if batch:
+        yield batch
+
+
+def export_snapshot(output_dir: str, dtype: str = "float32", batch_size: int = 1000) -> str:
+    """
+    Export the configured collection to a new snapshot directory.
+
+    Returns:
+        str: Path of the created snapshot directory
+    """
+    collection_name = config.MILVUS_COLLECTION_NAME
+    total = count_collection_entities(collection_name)
+    if total == 0:
+        raise ValueError(f"Collection '{collection_name}' is empty; nothing to export")
+
+    excluded = {PRIMARY_FIELD, TEXT_FIELD, DENSE_FIELD, SPARSE_FIELD}
+    field_names = get_collection_field_names(collection_name)
+    metadata_fields = [name for name in field_names if name not in excluded]
+    output_fields = [PRIMARY_FIELD, TEXT_FIELD, DENSE_FIELD] + metadata_fields
+
+    snapshot_dir = os.path.join(output_dir, f"{collection_name}-{time.strftime('%Y%m%dT%H%M%SZ', time.gmtime())}")
+    os.makedirs(snapshot_dir, exist_ok=False)
+
+    vectors = None
+    writer = ChunkWriter(snapshot_dir)
+    row_index = 0
+    try:
+        for batch in iterate_collection(collection_name, output_fields=output_fields, batch_size=batch_size):
+            if row_index + len(batch) > total:
+                raise RuntimeError("Collection grew during export; retry once ingestion has finished")
+
+            block = np.asarray([row[DENSE_FIELD] for row in batch], dtype=dtype)
+            if vectors is None:
+                # Written straight to disk so the export never holds all vectors in memory
+                vectors = np.lib.format.open_memmap(
+                    os.path.join(snapshot_dir, VECTORS_FILE), mode="w+", dtype=dtype, shape=(total, block.shape[1])
+                )
+            vectors[row_index:row_index + len(batch)] = block
+
+            writer.write([
+                {
+                    "id": str(row[PRIMARY_FIELD]),
+                    "text": row[TEXT_FIELD],
+                    "chunk_hash": compute_chunk_hash(row[TEXT_FIELD]),
+                    "metadata_json": json.dumps({name: row.get(name) for name in metadata_fields}, ensure_ascii=False),
+                }
+                for row in batch
+            ])
+            row_index += len(batch)
+    finally:
+        writer.close()
+        if vectors is not None:
+            vectors.flush()
+
+    if row_index != total:
+        raise RuntimeError(f"Exported {row_index} rows but collection reported {total}")
+
+    manifest = {
+        "format_version": SNAPSHOT_FORMAT_VERSION,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "collection": collection_name,
+        "embedding_model": config.EMBEDDING_MODEL_NAME,
+        "dimension": int(vectors.shape[1]),
+        "dtype": dtype,
+        "count": total,
+        "metadata_fields": metadata_fields,
+        "vectors_file": VECTORS_FILE,
+        "chunks_file": writer.file_name,
+        "chunks_format": writer.format,
+    }
+    with open(os.path.join(snapshot_dir, MANIFEST_FILE), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+
+    logger.info(f"Exported {total} chunks from '{collection_name}' to {snapshot_dir}")
+    return snapshot_dir
+
+
+def load_manifest(snapshot_dir: str) -> Dict[str, Any]:
+    with open(os.path.join(snapshot_dir, MANIFEST_FILE), "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    if manifest.get("format_version") != SNAPSHOT_FORMAT_VERSION:
+        raise ValueError(
+            f"Unsupported snapshot format {manifest.get('format_version')}; expected {SNAPSHOT_FORMAT_VERSION}"
+        )
+    return manifest
+
+
+async def import_snapshot(
+    snapshot_dir: str,
+    batch_size: int = 1000,
+    force: bool = False,
+    vector_store: Any = None
+) -> int:
+    """
+    Bulk-load a snapshot into a vector store without re-embedding.
+
+    Args:
+        snapshot_dir (str): Snapshot directory created by export_snapshot
+        batch_size (int): Rows per insert
+        force (bool): Import even if the snapshot's embedding model differs from config
+        vector_store: Any vector store exposing add_embeddings; defaults to the Milvus singleton
+
+    Returns:
+        int: Number of chunks imported
+    """
+    manifest = load_manifest(snapshot_dir)
+    if manifest["embedding_model"] != config.EMBEDDING_MODEL_NAME and not force:
+        raise ValueError(
+            f"Snapshot was embedded with '{manifest['embedding_model']}' but EMBEDDING_MODEL_NAME is "
+            f"'{config.EMBEDDING_MODEL_NAME}'; pass --force to import anyway"
+        )
+
+    vector_store = vector_store or await get_vector_store()
+    if vector_store is None:
+        raise RuntimeError("Failed to get vector store")
+
+    vectors = np.load(os.path.join(snapshot_dir, manifest["vectors_file"]), mmap_mode="r")
+    if vectors.shape != (manifest["count"], manifest["dimension"]):
+        raise ValueError(f"vectors.npy has shape {vectors.shape}, manifest expects ({manifest['count']}, {manifest['dimension']})")
+
+    use_ids = not getattr(vector_store, "auto_id", True)
+    imported = 0
+    for rows in iterate_chunks(snapshot_dir, manifest, batch_size):
+        for row in rows:
+            if compute_chunk_hash(row["text"]) != row["chunk_hash"]:
+                raise ValueError(f"Chunk hash mismatch for id {row['id']}; snapshot is corrupt")
+
+        block = np.asarray(vectors[imported:imported + len(rows)], dtype=np.float32)
+        vector_store.add_embeddings(
+            texts=[row["text"] for row in rows],
+            embeddings=block.tolist(),
+            metadatas=[json.loads(row["metadata_json"]) for row in rows],
+            batch_size=batch_size,
+            **({"ids": [row["id"] for row in rows]} if use_ids else {})
+        )
+        imported += len(rows)
+        logger.info(f"Imported {imported}/{manifest['count']} chunks")
+
+    if imported != manifest["count"]:
+        raise RuntimeError(f"Imported {imported} chunks but manifest lists {manifest['count']}")
+    return imported
+
+
+def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Export or import vector index snapshots.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = subparsers.add_parser("export", help="Export the configured collection")
+    export_parser.add_argument("--output-dir", default="snapshots")
+    export_parser.add_argument("--dtype", choices=["float32", "float16"], default="float32")
+    export_parser.add_argument("--batch-size", type=int, default=1000)
+
+    import_parser = subparsers.add_parser("import", help="Import a snapshot into the configured collection")
+    import_parser.add_argument("snapshot_dir")
+    import_parser.add_argument("--batch-size", type=int, default=1000)
+    import_parser.add_argument("--force", action="store_true", help="Ignore embedding model mismatch")
+    return parser.parse_args(argv)
+
+
+async def run(args: argparse.Namespace) -> None:
+    if not setup_milvus_database():
+        raise RuntimeError("Could not connect to Milvus")
+    if args.command == "export":
+        print(export_snapshot(args.output_dir, dtype=args.dtype, batch_size=args.batch_size))
+    else:
+        count = await import_snapshot(args.snapshot_dir, batch_size=args.batch_size, force=args.force)
+        print(f"Imported {count} chunks into '{config.MILVUS_COLLECTION_NAME}'")
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    logging.basicConfig(level=logging.INFO, format=config.LOG_FORMAT)
+    asyncio.run(run(parse_args(argv)))
+
+
+if __name__ == "__main__":
+    main()
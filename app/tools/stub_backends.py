@@ -0,0 +1,468 @@
+"""
+Stub LLM, embedding and vector store backends for local harnesses.
+
+The stub servers speak just enough of the OpenAI HTTP API (as served by vLLM)
+for the app's clients, with injectable latency distributions:
+
+    StubLLMServer        POST /v1/completions (streaming and non-streaming);
+                         tracks in-flight generations and when aborted ones free their slot,
+                         optionally simulating prefill cost with vLLM-style prefix caching
+    StubEmbeddingServer  POST /v1/embeddings; deterministic unit vectors
+    StubVectorStore      in-process replacement for the Milvus vector store
+
+Latency specs are strings: "const:0.05", "uniform:0.01,0.05",
+"exp:0.05" (mean) or "lognormal:0.05,0.5" (median, sigma).
+"""
+import asyncio
+import copy
+import hashlib
+import json
+import logging
+import os
+import random
+import re
+import socket
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+from langchain_core.documents import Document
+
+from app.config.config import config
+
+logger = logging.getLogger(__name__)
+
+DATASET_DIR = os.path.abspath(
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'pihex_task_dataset')
+)
+
+LatencyModel = Callable[[], float]
+
+
+def parse_latency(spec: str, seed: Optional[int] = None) -> LatencyModel:
+    """Build a latency sampler (seconds) from a spec string."""
+    rng = random.Random(seed)
+    kind, _, args = spec.partition(":")
+    values = [float(v) for v in args.split(",") if v]
+    if kind == "const":
+        return lambda: values[0]
+    if kind == "uniform":
+        return lambda: rng.uniform(values[0], values[1])
+    if kind == "exp":
+        return lambda: rng.expovariate(1.0 / values[0])
+    if kind == "lognormal":
+        median, sigma = values
+        return lambda: rng.lognormvariate(np.log(median), sigma)
+    raise ValueError(f"Unknown latency spec '{spec}'")
+
+
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]|\s+")
+
+
+def pseudo_tokenize(text: str) -> List[str]:
+    """Cheap tokenizer stand-in (words, punctuation, whitespace runs) for token accounting."""
+    return _TOKEN_RE.findall(text)
+
+
+class PrefixCacheSimulator:
+    """
+    Models vLLM automatic prefix caching: prompts are split into fixed-size
+    token blocks identified by a hash chained over all preceding blocks, and a
+    request reuses the leading run of blocks already computed. Never evicts.
+    """
+
+    def __init__(self, block_size: int = 16):
+        self.block_size = block_size
+        self._blocks = set()
+
+    def lookup_and_insert(self, tokens: Sequence[Any]) -> int:
+        """Return how many leading tokens were cached, then cache all full blocks of `tokens`."""
+        cached = 0
+        chain = b""
+        hit = True
+        for start in range(0, len(tokens) - self.block_size + 1, self.block_size):
+            chain = hashlib.sha1(chain + json.dumps(list(tokens[start:start + self.block_size])).encode()).digest()
+            if hit and chain in self._blocks:
+                cached += self.block_size
+            else:
+                hit = False
+                self._blocks.add(chain)
+        return cached
+
+
+class StubHTTPServer:
+    """Minimal HTTP/1.1 server answering one request per connection."""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        self.host = host
+        self.port = port
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._handlers: set = set()
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}/v1"
+
+    async def start(self) -> str:
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self.base_url
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            # Abandon generations still streaming to clients that stopped reading
+            for task in self._handlers:
+                task.cancel()
+            await asyncio.gather(*self._handlers, return_exceptions=True)
+            await self._server.wait_closed()
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        task = asyncio.current_task()
+        self._handlers.add(task)
+        try:
+            request_line = (await reader.readline()).decode("latin-1").strip()
+            if not request_line:
+                return
+            method, path, _ = request_line.split(" ", 2)
+            headers: Dict[str, str] = {}
+            while True:
+                line = (await reader.readline()).decode("latin-1").strip()
+                if not line:
+                    break
+                name, _, value = line.partition(":")
+                headers[name.strip().lower()] = value.strip()
+            body = await reader.readexactly(int(headers.get("content-length", "0")))
+            payload = json.loads(body) if body else {}
+            await self.handle(method, path, payload, reader, writer)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except Exception as e:
+            logger.error(f"Stub server error: {e}", exc_info=True)
+            await self.send_json(writer, {"error": str(e)}, status=500)
+        finally:
+            self._handlers.discard(task)
+            writer.close()
+
+    async def handle(self, method: str, path: str, payload: Dict[str, Any],
+                     reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        await self.send_json(writer, {"error": "not found"}, status=404)
+
+    @staticmethod
+    async def send_json(writer: asyncio.StreamWriter, payload: Dict[str, Any], status: int = 200) -> None:
+        body = json.dumps(payload).encode()
+        writer.write(
+            f"HTTP/1.1 {status} OK\r\nContent-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body
+        )
+        await writer.drain()
+
+
+class StubLLMServer(StubHTTPServer):
+    """
+    OpenAI-compatible completions endpoint emitting answer JSON, with
+    sources copied from the context only if the prompt's schema asks for them.
+
+    Each generation waits `first_token_latency`, then emits `output_tokens`
+    tokens with `token_latency` between them. With `prefill_token_latency` set,
+    each uncached prompt token (per `prefix_cache`) adds to time-to-first-token.
+    A fraction `error_rate` of requests fail with HTTP 500 before generating.
+    A client disconnect aborts the generation immediately, like vLLM does, and
+    the time the slot was freed is recorded in `aborted_at`.
+    """
+
+    def __init__(
+        self,
+        first_token_latency: LatencyModel = lambda: 0.05,
+        token_latency: LatencyModel = lambda: 0.01,
+        output_tokens: int = 50,
+        category: str = "api",
+        prefill_token_latency: float = 0.0,
+        prefix_cache: Optional[PrefixCacheSimulator] = None,
+        error_rate: float = 0.0,
+        **kwargs: Any
+    ):
+        super().__init__(**kwargs)
+        self.first_token_latency = first_token_latency
+        self.token_latency = token_latency
+        self.output_tokens = output_tokens
+        self.category = category
+        self.prefill_token_latency = prefill_token_latency
+        self.prefix_cache = prefix_cache
+        self.error_rate = error_rate
+        self.requests = 0
+        self.errors = 0
+        self.active = 0
+        self.completed = 0
+        self.aborted_at: List[float] = []
+        self.prompt_chars: List[int] = []
+        self.prompt_tokens: List[int] = []
+        self.cached_prompt_tokens: List[int] = []
+
+    def _tokens(self, prompt: str = "") -> List[str]:
+        filler = " ".join(["stub"] * max(1, self.output_tokens - 12))
+        answer: Dict[str, Any] = {"answer": filler, "category": self.category, "confidence": 0.5}
+        instructions, _, context = prompt.partition("Context:")
+        if '"sources"' in instructions:
+            # Like a real model asked for citations: copy the start of every context chunk back out
+            answer["sources"] = [
+                {"doc": doc, "snippet": content[:160]}
+                for doc, content in re.findall(r"document_name: (.*)\n(?:.*\n){3}page_content: (.*)", context)
+            ]
+        # Roughly one token per word, keeping the JSON intact when joined
+        return re.findall(r"\S+\s*|\s+", json.dumps(answer))
+
+    async def handle(self, method, path, payload, reader, writer):
+        if not path.endswith("/completions"):
+            return await super().handle(method, path, payload, reader, writer)
+
+        self.requests += 1
+        if self.error_rate and random.random() < self.error_rate:
+            self.errors += 1
+            return await self.send_json(writer, {"error": "stub failure"}, status=500)
+
+        prompt = payload.get("prompt", "")
+        prompt = "".join(prompt) if isinstance(prompt, list) else prompt
+        prompt_tokens = pseudo_tokenize(prompt)
+        cached = self.prefix_cache.lookup_and_insert(prompt_tokens) if self.prefix_cache else 0
+        self.prompt_chars.append(len(prompt))
+        self.prompt_tokens.append(len(prompt_tokens))
+        self.cached_prompt_tokens.append(cached)
+        prefill_delay = (len(prompt_tokens) - cached) * self.prefill_token_latency
+        self.active += 1
+        disconnected = asyncio.ensure_future(reader.read())  # Resolves with b"" once the client closes
+        try:
+            tokens = self._tokens(prompt)
+            if payload.get("stream"):
+                writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\nConnection: close\r\n\r\n")
+            if await self._sleep_or_disconnect(self.first_token_latency() + prefill_delay, disconnected):
+                return
+            for index, token in enumerate(tokens):
+                if index and await self._sleep_or_disconnect(self.token_latency(), disconnected):
+                    return
+                if payload.get("stream"):
+                    chunk = {"id": "stub", "object": "text_completion", "created": int(time.time()),
+                             "model": payload.get("model"),
+                             "choices": [{"text": token, "index": 0, "logprobs": None, "finish_reason": None}]}
+                    writer.write(f"data: {json.dumps(chunk)}\n\n".encode())
+                    await writer.drain()
+            if payload.get("stream"):
+                writer.write(b"data: [DONE]\n\n")
+                await writer.drain()
+            else:
+                await self.send_json(writer, {
+                    "id": "stub", "object": "text_completion", "created": int(time.time()),
+                    "model": payload.get("model"),
+                    "choices": [{"text": "".join(tokens), "index": 0, "logprobs": None, "finish_reason": "stop"}],
+                    "usage": {"prompt_tokens": len(prompt_tokens), "completion_tokens": len(tokens),
+                              "total_tokens": len(prompt_tokens) + len(tokens)},
+                })
+            self.completed += 1
+        except ConnectionError:
+            self.aborted_at.append(time.monotonic())
+        finally:
+            disconnected.cancel()
+            self.active -= 1
+
+    async def _sleep_or_disconnect(self, delay: float, disconnected: asyncio.Future) -> bool:
+        """Sleep for `delay`; return True (and record the abort) if the client went away."""
+        done, _ = await asyncio.wait({disconnected}, timeout=delay)
+        if done:
+            self.aborted_at.append(time.monotonic())
+            return True
+        return False
+
+
+class StubEmbeddingServer(StubHTTPServer):
+    """OpenAI-compatible embeddings endpoint returning deterministic unit vectors."""
+
+    def __init__(self, latency: LatencyModel = lambda: 0.005, dimension: int = 1024, **kwargs: Any):
+        super().__init__(**kwargs)
+        self.latency = latency
+        self.dimension = dimension
+        self.requests = 0
+
+    async def handle(self, method, path, payload, reader, writer):
+        if not path.endswith("/embeddings"):
+            return await super().handle(method, path, payload, reader, writer)
+        self.requests += 1
+        inputs = payload.get("input", [])
+        if isinstance(inputs, str) or (inputs and isinstance(inputs[0], int)):
+            inputs = [inputs]
+        await asyncio.sleep(self.latency())
+        await self.send_json(writer, {
+            "object": "list",
+            "model": payload.get("model"),
+            "data": [{"object": "embedding", "index": i, "embedding": stub_vector(item, self.dimension)}
+                     for i, item in enumerate(inputs)],
+            "usage": {"prompt_tokens": 0, "total_tokens": 0},
+        })
+
+
+def stub_vector(item: Any, dimension: int) -> List[float]:
+    seed = int.from_bytes(hashlib.sha256(json.dumps(item).encode()).digest()[:8], "little")
+    vector = np.random.default_rng(seed).standard_normal(dimension)
+    return (vector / np.linalg.norm(vector)).tolist()
+
+
+class StubVectorStore:
+    """
+    In-memory stand-in for the Milvus vector store.
+
+    Hybrid search embeds the query through the configured embedder (so the
+    embedding hop is still exercised), waits `latency`, and ranks chunks by
+    word overlap with RRF-like scores (2 / (k + 1 + rank), k from `ranker_params`,
+    default 60). Inserts block the
+    calling thread for `insert_latency`, like the synchronous Milvus client.
+    It stores no dense vectors, so category centroids come from the seed descriptions.
+    """
+
+    def __init__(
+        self,
+        embedding_function: Any = None,
+        latency: LatencyModel = lambda: 0.01,
+        insert_latency: LatencyModel = lambda: 0.0
+    ):
+        self.embedding_func = embedding_function
+        self.latency = latency
+        self.insert_latency = insert_latency
+        self.documents: List[Document] = []
+
+    def load_dataset(self, dataset_dir: str = DATASET_DIR) -> "StubVectorStore":
+        """Chunk and add every markdown file in `dataset_dir` (defaults to the bundled dataset)."""
+        from app.rag.document_processor import load_and_chunk_document
+        for name in sorted(os.listdir(dataset_dir)):
+            if name.endswith(".md"):
+                self.add_documents(load_and_chunk_document(os.path.join(dataset_dir, name)))
+        return self
+
+    def add_documents(self, documents: List[Document], **kwargs: Any) -> List[str]:
+        time.sleep(self.insert_latency())
+        self.documents.extend(documents)
+        return [str(i) for i in range(len(self.documents) - len(documents), len(self.documents))]
+
+    def sample_dense_vectors_by_category(self, *args: Any, **kwargs: Any) -> Dict[str, List[List[float]]]:
+        """Stand-in for milvus_utils.sample_dense_vectors_by_category; no stored vectors."""
+        return {}
+
+    async def _acollection_hybrid_search(self, query: str, k: int = 4, expr: Optional[str] = None,
+                                         timeout: Optional[float] = None, **kwargs: Any) -> List[List[dict]]:
+        if self.embedding_func is not None:
+            await self.embedding_func.aembed_query(query)
+        await asyncio.sleep(self.latency())
+
+        candidates = self.documents
+        match = re.search(r"in \[(.*)\]", expr or "")
+        if match:
+            allowed = {value.strip().strip('"') for value in match.group(1).split(",")}
+            key = config.CATEGORY_PARTITION_KEY_FIELD
+            candidates = [d for d in candidates if d.metadata.get(key) in allowed]
+
+        words = set(re.findall(r"\w+", query.lower()))
+        ranked = sorted(
+            candidates,
+            key=lambda d: len(words & set(re.findall(r"\w+", d.page_content.lower()))),
+            reverse=True
+        )[:k]
+        rrf_k = (kwargs.get("ranker_params") or {}).get("k") or 60
+        return [[
+            {"id": i, "distance": 2 / (rrf_k + 1 + rank), "entity": {"text": d.page_content, **d.metadata}}
+            for rank, (i, d) in enumerate((self.documents.index(d), d) for d in ranked)
+        ]]
+
+
+# Module state replaced by install_stub_backends or built from the stubs, restored by preserved_app_state
+_STUBBED_MODULE_STATE = {
+    "app.utils.embedding_utils": ["_dense_embedding_model", "_query_embedding_model"],
+    "app.utils.milvus_utils": ["_vector_store_instance"],
+    "app.utils.llm_utils": ["_llm_router"],
+    "app.rag.category_router": [
+        "sample_dense_vectors_by_category", "_centroids", "_centroid_labels",
+        "_build_task", "_rebuild_requested", "_failed_builds", "_retry_at",
+    ],
+}
+
+
+@contextmanager
+def preserved_app_state() -> Iterator[None]:
+    """
+    Restore config and the app's backend singletons when the block exits.
+
+    Harnesses that install stubs (or flip config flags) inside another process,
+    such as pytest, wrap themselves in this so later code sees the original setup.
+    """
+    import importlib
+
+    modules = {name: importlib.import_module(name) for name in _STUBBED_MODULE_STATE}
+    saved_config = copy.deepcopy(vars(config))
+    saved_state = {
+        (name, attribute): getattr(modules[name], attribute)
+        for name, attributes in _STUBBED_MODULE_STATE.items()
+        for attribute in attributes
+    }
+    try:
+        yield
+    finally:
+        # A centroid build started against the stubs must not outlive them
+        build_task = modules["app.rag.category_router"]._build_task
+        if build_task is not None and build_task is not saved_state[("app.rag.category_router", "_build_task")]:
+            build_task.cancel()
+        for attribute, value in saved_config.items():
+            setattr(config, attribute, value)
+        for (name, attribute), value in saved_state.items():
+            setattr(modules[name], attribute, value)
+
+
+def install_stub_backends(
+    llm_url: Optional[str] = None,
+    embedding_url: Optional[str] = None,
+    vector_store: Optional[StubVectorStore] = None
+) -> None:
+    """
+    Point the app's clients at stub servers and replace the vector store singleton.
+
+    This changes process-global state; use preserved_app_state to undo it.
+    """
+    from app.rag import category_router
+    from app.utils import embedding_utils, milvus_utils
+
+    if llm_url:
+        config.LLM_API_BASE = llm_url
+        config.LLM_API_BASES = []
+    if embedding_url:
+        config.VLLM_EMBEDDING_URL = embedding_url
+        embedding_utils._dense_embedding_model = None
+        embedding_utils._query_embedding_model = None
+    if vector_store is not None:
+        milvus_utils._vector_store_instance = vector_store
+        category_router.sample_dense_vectors_by_category = vector_store.sample_dense_vectors_by_category
+
+
+async def start_stub_stack(
+    llm: Optional[StubLLMServer] = None,
+    embedder: Optional[StubEmbeddingServer] = None,
+    store_kwargs: Optional[Dict[str, Any]] = None
+) -> List[StubHTTPServer]:
+    """
+    Start stub LLM and embedding servers, load the bundled dataset into a
+    StubVectorStore (built with `store_kwargs`) and install all three.
+    Returns the servers so they can be stopped.
+    """
+    from app.utils.embedding_utils import initialize_query_embedding_model
+    from app.utils.milvus_utils import initialize_embeddings
+
+    llm = llm or StubLLMServer()
+    embedder = embedder or StubEmbeddingServer()
+    install_stub_backends(llm_url=await llm.start(), embedding_url=await embedder.start())
+    await initialize_query_embedding_model()
+    store = StubVectorStore(embedding_function=initialize_embeddings(), **(store_kwargs or {})).load_dataset()
+    install_stub_backends(vector_store=store)
+    return [llm, embedder]
+
+
+def free_port() -> int:
+    """An unused local TCP port, e.g. for serving the app under test with uvicorn."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
@@ -0,0 +1,184 @@
+"""Admission control and load shedding for pipeline stages"""
+import asyncio
+import heapq
+import itertools
+import logging
+import math
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, List, Optional, Tuple
+
+from app.config.config import config
+from app.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Lower value is served first
+PRIORITY_LEVELS = {"high": 0, "normal": 1, "low": 2}
+
+metrics.describe("admission_in_flight", "Requests currently holding a stage slot")
+metrics.describe("admission_queue_depth", "Requests waiting for a stage slot")
+metrics.describe("admission_admitted_total", "Requests admitted to a stage")
+metrics.describe("admission_shed_total", "Requests rejected by a stage, by reason")
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request is shed instead of queued."""
+
+    def __init__(self, stage: str, reason: str, retry_after: float):
+        self.stage = stage
+        self.reason = reason
+        self.retry_after = retry_after
+        super().__init__(f"{stage} admission rejected ({reason}); retry after {retry_after:.1f}s")
+
+    @property
+    def retry_after_header(self) -> str:
+        """Value for the Retry-After header (whole seconds, at least 1)."""
+        return str(max(1, math.ceil(self.retry_after)))
+
+
+class AdmissionController:
+    """
+    Bounds concurrency of one pipeline stage.
+
+    At most `max_in_flight` requests hold a slot; up to `max_queue` more wait in
+    priority order. A request is rejected immediately if the queue is full or if
+    its estimated wait (from an EWMA of slot hold time) would overrun its
+    deadline, and rejected later if the deadline passes while it is queued.
+    Must be used from a single event loop.
+    """
+
+    def __init__(self, stage: str, max_in_flight: int, max_queue: int, service_time: float, enabled: bool = True):
+        self.stage = stage
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.enabled = enabled
+        self._service_time = service_time
+        self._in_flight = 0
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._sequence = itertools.count()
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    @property
+    def queue_depth(self) -> int:
+        return sum(1 for _, _, future in self._waiters if not future.done())
+
+    def estimate_wait(self, level: int) -> float:
+        """Estimated seconds until a new request at `level` would get a slot."""
+        ahead = sum(1 for waiter_level, _, future in self._waiters if waiter_level <= level and not future.done())
+        if ahead == 0 and self._in_flight < self.max_in_flight:
+            return 0.0
+        return (ahead // self.max_in_flight + 1) * self._service_time
+
+    @asynccontextmanager
+    async def slot(self, priority: str = "normal", deadline: Optional[float] = None) -> AsyncIterator[None]:
+        """
+        Hold a stage slot for the duration of the block.
+
+        Args:
+            priority (str): One of PRIORITY_LEVELS
+            deadline (Optional[float]): Absolute time.monotonic() by which the request must be served
+
+        Raises:
+            AdmissionRejected: If the request is shed
+        """
+        if not self.enabled:
+            yield
+            return
+
+        await self._acquire(PRIORITY_LEVELS.get(priority, PRIORITY_LEVELS["normal"]), deadline)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self._service_time = 0.8 * self._service_time + 0.2 * (time.monotonic() - started)
+            self._release()
+
+    async def _acquire(self, level: int, deadline: Optional[float]) -> None:
+        if self._in_flight < self.max_in_flight and self.queue_depth == 0:
+            self._in_flight += 1
+            self._admitted()
+            return
+
+        now = time.monotonic()
+        expected_wait = self.estimate_wait(level)
+        if self.queue_depth >= self.max_queue:
+            self._shed("queue_full", expected_wait)
+        if deadline is not None and now + expected_wait > deadline:
+            self._shed("deadline", expected_wait)
+
+        future = asyncio.get_running_loop().create_future()
+        entry = (level, next(self._sequence), future)
+        heapq.heappush(self._waiters, entry)
+        self._publish()
+
+        try:
+            timeout = None if deadline is None else max(0.0, deadline - now)
+            await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            # wait_for can time out after the slot was handed over (Python 3.12+); pass it on
+            if future.done() and not future.cancelled():
+                self._release()
+            else:
+                self._discard(entry)
+            self._shed("deadline", self.estimate_wait(level))
+        except asyncio.CancelledError:
+            # The slot may have been handed over just before cancellation
+            if future.done() and not future.cancelled():
+                self._release()
+            else:
+                future.cancel()
+                self._discard(entry)
+            raise
+        self._admitted()
+
+    def _release(self) -> None:
+        # Hand the slot straight to the highest-priority waiter, if any
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                future.set_result(None)
+                self._publish()
+                return
+        self._in_flight -= 1
+        self._publish()
+
+    def _discard(self, entry: Tuple[int, int, asyncio.Future]) -> None:
+        if entry in self._waiters:
+            self._waiters.remove(entry)
+            heapq.heapify(self._waiters)
+        self._publish()
+
+    def _admitted(self) -> None:
+        metrics.inc("admission_admitted_total", stage=self.stage)
+        self._publish()
+
+    def _shed(self, reason: str, expected_wait: float) -> None:
+        metrics.inc("admission_shed_total", stage=self.stage, reason=reason)
+        self._publish()
+        logger.warning(f"Shedding {self.stage} request ({reason}); estimated wait {expected_wait:.2f}s")
+        raise AdmissionRejected(self.stage, reason, retry_after=expected_wait)
+
+    def _publish(self) -> None:
+        metrics.set_gauge("admission_in_flight", self._in_flight, stage=self.stage)
+        metrics.set_gauge("admission_queue_depth", self.queue_depth, stage=self.stage)
+
+
+# Create singleton controllers for the two expensive /api/ask stages
+retrieval_admission = AdmissionController(
+    "retrieval",
+    max_in_flight=config.ADMISSION_RETRIEVAL_MAX_IN_FLIGHT,
+    max_queue=config.ADMISSION_RETRIEVAL_MAX_QUEUE,
+    service_time=config.ADMISSION_RETRIEVAL_SERVICE_TIME,
+    enabled=config.ADMISSION_CONTROL_ENABLED,
+)
+llm_admission = AdmissionController(
+    "llm",
+    max_in_flight=config.ADMISSION_LLM_MAX_IN_FLIGHT,
+    max_queue=config.ADMISSION_LLM_MAX_QUEUE,
+    service_time=config.ADMISSION_LLM_SERVICE_TIME,
+    enabled=config.ADMISSION_CONTROL_ENABLED,
+)
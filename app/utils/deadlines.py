@@ -0,0 +1,86 @@
+"""Request deadlines and cancellation on client disconnect"""
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, Optional, TypeVar
+
+from app.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+metrics.describe("ask_cancelled_total", "Requests cancelled mid-pipeline, by reason (disconnect or deadline)")
+
+
+class DeadlineExceeded(Exception):
+    """Raised when a request's time budget is used up."""
+    pass
+
+
+class ClientDisconnected(Exception):
+    """Raised when the client went away before the response was ready."""
+    pass
+
+
+def remaining_time(deadline: Optional[float]) -> Optional[float]:
+    """
+    Seconds left until `deadline` (time.monotonic()), or None if there is no deadline.
+
+    Raises:
+        DeadlineExceeded: If the deadline has already passed
+    """
+    if deadline is None:
+        return None
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        raise DeadlineExceeded("Request deadline exceeded")
+    return remaining
+
+
+async def run_with_cancellation(
+    coro: Awaitable[T],
+    deadline: Optional[float] = None,
+    is_disconnected: Optional[Callable[[], Awaitable[bool]]] = None,
+    poll_interval: float = 0.25
+) -> T:
+    """
+    Run `coro` as a task and cancel it when the deadline passes or the client disconnects.
+
+    Cancellation propagates into whatever the task is awaiting (Milvus search,
+    embedding or LLM HTTP calls), closing their connections so upstream servers
+    stop work for a request nobody will read.
+
+    Args:
+        coro (Awaitable[T]): The pipeline coroutine
+        deadline (Optional[float]): Absolute time.monotonic() deadline
+        is_disconnected (Optional[Callable[[], Awaitable[bool]]]): Polled to detect client disconnects
+        poll_interval (float): Seconds between disconnect checks
+
+    Raises:
+        DeadlineExceeded: If the deadline passed first
+        ClientDisconnected: If the client disconnected first
+    """
+    task = asyncio.ensure_future(coro)
+    try:
+        while True:
+            timeout = poll_interval
+            if deadline is not None:
+                timeout = min(timeout, max(0.0, deadline - time.monotonic()))
+            done, _ = await asyncio.wait({task}, timeout=timeout)
+            if task in done:
+                return task.result()
+
+            if deadline is not None and time.monotonic() >= deadline:
+                metrics.inc("ask_cancelled_total", reason="deadline")
+                raise DeadlineExceeded("Request deadline exceeded")
+            if is_disconnected is not None and await is_disconnected():
+                metrics.inc("ask_cancelled_total", reason="disconnect")
+                raise ClientDisconnected("Client disconnected")
+    finally:
+        if not task.done():
+            task.cancel()
+            try:
+                await task
+            except (asyncio.CancelledError, Exception):
+                pass
@@ -1,4 +1,12 @@
+import asyncio
 import logging
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
 from langchain_openai import OpenAIEmbeddings
 from app.config.config import config
 
@@ -6,6 +14,7 @@ logger = logging.getLogger(__name__)
 
 # --- Dense Embeddings ---
 _dense_embedding_model = None
+_query_embedding_model = None
 
 def get_dense_embedding_model() -> OpenAIEmbeddings:
     """Initializes and returns the dense embedding model client (via vLLM)."""
@@ -16,10 +25,179 @@ def get_dense_embedding_model() -> OpenAIEmbeddings:
             _dense_embedding_model = OpenAIEmbeddings(
                 model=config.EMBEDDING_MODEL_NAME,
                 openai_api_base=config.VLLM_EMBEDDING_URL,
-                openai_api_key=config.LLM_API_KEY
+                openai_api_key=config.LLM_API_KEY,
+                # vLLM tokenizes with the model's own tokenizer; tiktoken ids would be meaningless to it
+                check_embedding_ctx_length=False
             )
             logger.info("Dense embedding model initialized.")
         except Exception as e:
             logger.error(f"Failed to initialize dense embedding model: {e}", exc_info=True)
             raise
     return _dense_embedding_model
+
+
+# --- In-process Query Embeddings ---
+class LocalQueryEmbeddings(Embeddings):
+    """
+    Embeds single queries in-process on CPU and delegates document batches to the remote embedder.
+
+    Encoding runs in a dedicated thread pool so the event loop is never blocked by inference.
+    """
+
+    def __init__(
+        self,
+        model_path: str,
+        remote: Embeddings,
+        quantize_int8: bool = False,
+        max_workers: int = 2
+    ):
+        # Imported lazily: torch is only needed when the local encoder is enabled
+        from sentence_transformers import SentenceTransformer
+
+        self._remote = remote
+        self._model = SentenceTransformer(model_path, device="cpu")
+        if quantize_int8:
+            import torch
+            self._model = torch.quantization.quantize_dynamic(
+                self._model, {torch.nn.Linear}, dtype=torch.qint8
+            )
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="query-embedder")
+
+    def _encode(self, text: str) -> List[float]:
+        return self._model.encode(text, normalize_embeddings=True, convert_to_numpy=True).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._encode(text)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self._encode, text)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._remote.embed_documents(texts)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await self._remote.aembed_documents(texts)
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False)
+
+
+async def check_query_embedding_parity(local: Embeddings, remote: Embeddings, texts: List[str]) -> float:
+    """Return the minimum cosine similarity between local and remote query embeddings of `texts`."""
+    local_vectors = np.asarray([await local.aembed_query(text) for text in texts], dtype=np.float32)
+    remote_vectors = np.asarray([await remote.aembed_query(text) for text in texts], dtype=np.float32)
+    if local_vectors.shape != remote_vectors.shape:
+        logger.error(f"Embedding dimension mismatch: local {local_vectors.shape}, remote {remote_vectors.shape}")
+        return 0.0
+
+    local_vectors /= np.clip(np.linalg.norm(local_vectors, axis=1, keepdims=True), 1e-12, None)
+    remote_vectors /= np.clip(np.linalg.norm(remote_vectors, axis=1, keepdims=True), 1e-12, None)
+    return float((local_vectors * remote_vectors).sum(axis=1).min())
+
+
+async def initialize_query_embedding_model() -> Embeddings:
+    """
+    Initializes the embedder used for queries.
+
+    When LOCAL_QUERY_EMBEDDER_ENABLED is set, loads the local encoder and keeps it only if its
+    vectors match the remote embedder (cosine >= LOCAL_EMBEDDING_PARITY_MIN_COSINE) on the
+    parity texts. Otherwise, or on any failure, queries use the remote embedder.
+    """
+    global _query_embedding_model
+    remote = get_dense_embedding_model()
+    _query_embedding_model = remote
+
+    if not config.LOCAL_QUERY_EMBEDDER_ENABLED:
+        return _query_embedding_model
+
+    model_path = config.LOCAL_EMBEDDING_MODEL_PATH or config.EMBEDDING_MODEL_NAME
+    local: Optional[LocalQueryEmbeddings] = None
+    try:
+        logger.info(f"Loading local query embedder from {model_path} (int8: {config.LOCAL_EMBEDDING_QUANTIZE_INT8})")
+        local = LocalQueryEmbeddings(
+            model_path,
+            remote=remote,
+            quantize_int8=config.LOCAL_EMBEDDING_QUANTIZE_INT8,
+            max_workers=config.LOCAL_EMBEDDING_THREADS
+        )
+        min_cosine = await check_query_embedding_parity(local, remote, config.LOCAL_EMBEDDING_PARITY_TEXTS)
+        if min_cosine < config.LOCAL_EMBEDDING_PARITY_MIN_COSINE:
+            logger.error(
+                f"Local query embedder failed parity check (min cosine {min_cosine:.4f} < "
+                f"{config.LOCAL_EMBEDDING_PARITY_MIN_COSINE}); using remote embedder"
+            )
+            local.shutdown()
+            return _query_embedding_model
+
+        logger.info(f"Local query embedder passed parity check (min cosine {min_cosine:.4f})")
+        _query_embedding_model = local
+
+    except Exception as e:
+        logger.error(f"Failed to initialize local query embedder, using remote embedder: {e}", exc_info=True)
+        if local is not None:
+            local.shutdown()
+
+    return _query_embedding_model
+
+
+def get_query_embedding_model() -> Embeddings:
+    """Returns the embedder for queries: the local encoder if initialized, else the remote embedder."""
+    return _query_embedding_model or get_dense_embedding_model()
+
+
+# --- Per-request query vector reuse ---
+# Set by query_embedding_cache(); the dict is shared with the tasks started inside the block
+_request_query_vectors: ContextVar[Optional[Dict[str, List[float]]]] = ContextVar("request_query_vectors", default=None)
+
+
+@contextmanager
+def query_embedding_cache(vectors: Optional[Dict[str, List[float]]] = None) -> Iterator[None]:
+    """
+    Within this block each distinct query text is embedded once (category routing, every hybrid search).
+
+    `vectors` pre-seeds the cache with already computed query embeddings.
+    """
+    token = _request_query_vectors.set(dict(vectors or {}))
+    try:
+        yield
+    finally:
+        _request_query_vectors.reset(token)
+
+
+async def aembed_query_cached(text: str) -> List[float]:
+    """Embed a query with the query embedder, reusing the vector from earlier in the same request."""
+    cache = _request_query_vectors.get()
+    if cache is not None and text in cache:
+        return cache[text]
+    vector = await get_query_embedding_model().aembed_query(text)
+    if cache is not None:
+        cache[text] = vector
+    return vector
+
+
+class RequestCachedQueryEmbeddings(Embeddings):
+    """
+    The current query embedder, with `aembed_query` memoized per request.
+
+    Given to the vector store, whose hybrid search embeds the query itself, so
+    the search reuses the vector the category router already computed.
+    """
+
+    def embed_query(self, text: str) -> List[float]:
+        return get_query_embedding_model().embed_query(text)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return await aembed_query_cached(text)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return get_query_embedding_model().embed_documents(texts)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await get_query_embedding_model().aembed_documents(texts)
+
+
+def shutdown_query_embedding_model() -> None:
+    """Releases the local encoder thread pool, if any."""
+    if isinstance(_query_embedding_model, LocalQueryEmbeddings):
+        _query_embedding_model.shutdown()
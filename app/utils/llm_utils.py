@@ -1,7 +1,15 @@
 """LLM configuration and initialization"""
+import asyncio
 import os
+import random
+import time
+from collections import deque
+from typing import AsyncIterator, Iterable, List, Optional, Set, Tuple
+import httpx
+import openai
 from langchain_openai import ChatOpenAI
 from app.config.config import config    
+from app.utils.metrics import metrics
 from langchain_community.llms import VLLMOpenAI
 
 import logging
@@ -50,6 +58,10 @@ def get_llm(
 def get_llm_doc(
     temperature: float = 0,
     max_tokens: int = 10,
+    timeout: Optional[float] = None,
+    streaming: bool = False,
+    api_base: Optional[str] = None,
+    max_retries: int = 2,
     **kwargs
 ):
     """
@@ -58,6 +70,10 @@ def get_llm_doc(
     Args:
         max_tokens: Optional override for token limit
         temperature: Optional override for temperature
+        timeout: Optional request timeout in seconds (e.g. the caller's remaining time budget)
+        streaming: Stream tokens, so cancelling the caller closes the request and frees the vLLM slot
+        api_base: Optional endpoint override (defaults to LLM_API_BASE)
+        max_retries: Client-side retries on connection errors and 5xx responses
         model_kwargs: Optional additional model parameters
         
     Returns:
@@ -69,12 +85,376 @@ def get_llm_doc(
     try:
         return VLLMOpenAI(
             openai_api_key=config.LLM_API_KEY,
-            openai_api_base=config.LLM_API_BASE,
+            openai_api_base=api_base or config.LLM_API_BASE,
             model_name=config.LLM_MODEL_NAME,
             temperature=config.LLM_TEMPERATURE,
             max_tokens=config.LLM_MAX_TOKENS,
+            request_timeout=timeout,
+            max_retries=max_retries,
+            streaming=streaming,
             model_kwargs={**kwargs}
         )
     except Exception as e:
         logger.error(f"Failed to initialize LLM: {str(e)}")
-        raise LLMError(f"LLM initialization failed: {str(e)}")
\ No newline at end of file
+        raise LLMError(f"LLM initialization failed: {str(e)}")
+
+
+# --- Multi-endpoint routing ---
+metrics.describe("llm_endpoint_outstanding", "Generations in flight per LLM endpoint")
+metrics.describe("llm_endpoint_circuit_open", "1 while an LLM endpoint is ejected by its circuit breaker")
+metrics.describe("llm_requests_total", "LLM generations per endpoint, by outcome")
+metrics.describe("llm_hedges_total", "Hedged LLM requests, by outcome")
+
+
+def classify_llm_error(error: BaseException, budget_limited: bool) -> str:
+    """
+    Outcome of a failed generation, as recorded against its endpoint.
+
+    Only "failure" counts towards the circuit breaker: connection errors, 5xx
+    responses, and timeouts of the endpoint's own request timeout. A timeout
+    that fired because the caller's remaining budget was shorter ("deadline")
+    or a 4xx/other error ("error") says nothing about the replica's health.
+
+    Args:
+        error (BaseException): The exception raised by the client
+        budget_limited (bool): Whether the call's timeout was the caller's remaining budget
+    """
+    if isinstance(error, (openai.APITimeoutError, httpx.TimeoutException, asyncio.TimeoutError)):
+        return "deadline" if budget_limited else "failure"
+    if isinstance(error, (openai.APIConnectionError, httpx.TransportError)):
+        return "failure"
+    if isinstance(error, openai.APIStatusError):
+        return "failure" if error.status_code >= 500 else "error"
+    return "error"
+
+
+def _chunk_text(chunk: openai.types.Completion) -> str:
+    """Text of one streamed completion chunk."""
+    return chunk.choices[0].text if chunk.choices else ""
+
+
+class LLMEndpoint:
+    """
+    One vLLM replica with its outstanding-request count and circuit breaker.
+
+    The breaker opens after `failure_threshold` consecutive failures. Once
+    `reset_timeout` has passed it is half-open: a single probe request is let
+    through, and its outcome closes the breaker or opens it again.
+    """
+
+    def __init__(self, base_url: str, failure_threshold: int, reset_timeout: float):
+        self.base_url = base_url
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.outstanding = 0
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+        self._probing = False
+        self._client = None
+
+    @property
+    def client(self) -> openai.AsyncOpenAI:
+        """Completions client for this endpoint, built once (construction costs tens of ms of CPU)."""
+        if self._client is None:
+            # The router fails over itself, so client-side retries would only delay it
+            self._client = openai.AsyncOpenAI(api_key=config.LLM_API_KEY, base_url=self.base_url, max_retries=0)
+        return self._client
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def available(self) -> bool:
+        state = self.state
+        return state == "closed" or (state == "half_open" and not self._probing)
+
+    def on_start(self) -> None:
+        if self.state == "half_open":
+            self._probing = True
+        self.outstanding += 1
+        self._publish()
+
+    def on_success(self) -> None:
+        if self.opened_at is not None:
+            logger.info(f"LLM endpoint {self.base_url} recovered; closing circuit")
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self._probing = False
+        self._publish()
+
+    def on_failure(self) -> None:
+        self.consecutive_failures += 1
+        if self._probing or self.consecutive_failures >= self.failure_threshold:
+            if self.opened_at is None or self._probing:
+                logger.warning(
+                    f"Opening circuit for LLM endpoint {self.base_url} after "
+                    f"{self.consecutive_failures} consecutive failures"
+                )
+            self.opened_at = time.monotonic()
+        self._probing = False
+        self._publish()
+
+    def on_finish(self, outcome: str) -> None:
+        """Release the request. A probe that ends without a health verdict leaves the breaker half-open."""
+        self.outstanding -= 1
+        if outcome in ("cancelled", "deadline", "error"):
+            self._probing = False
+        metrics.inc("llm_requests_total", endpoint=self.base_url, outcome=outcome)
+        self._publish()
+
+    def _publish(self) -> None:
+        metrics.set_gauge("llm_endpoint_outstanding", self.outstanding, endpoint=self.base_url)
+        metrics.set_gauge("llm_endpoint_circuit_open", int(self.opened_at is not None), endpoint=self.base_url)
+
+
+class LLMRouter:
+    """
+    Routes streamed generations across vLLM replicas.
+
+    Each request goes to the available endpoint with the fewest outstanding
+    requests (ties broken at random); an endpoint that fails before the first
+    token is marked failed and the request moves to the next one. Every call
+    is bounded by `request_timeout` or the caller's remaining budget, whichever
+    is shorter; only the former counts as an endpoint failure, so clients with
+    short deadlines cannot eject healthy replicas. With hedging,
+    a request whose first token has not arrived after the `hedge_quantile` of
+    recent time-to-first-token is duplicated to another replica; whichever
+    answers first is kept and the other is cancelled, which closes its
+    connection so vLLM aborts it. Must be used from a single event loop.
+    """
+
+    def __init__(
+        self,
+        base_urls: Iterable[str],
+        failure_threshold: int = 3,
+        reset_timeout: float = 10.0,
+        request_timeout: Optional[float] = 60.0,
+        hedging_enabled: bool = False,
+        hedge_quantile: float = 0.95,
+        hedge_min_delay: float = 0.05,
+        hedge_min_samples: int = 20,
+        hedge_window: int = 200
+    ):
+        self.endpoints = [LLMEndpoint(url, failure_threshold, reset_timeout) for url in base_urls]
+        if not self.endpoints:
+            raise LLMError("At least one LLM endpoint is required")
+        self.request_timeout = request_timeout
+        self.hedging_enabled = hedging_enabled
+        self.hedge_quantile = hedge_quantile
+        self.hedge_min_delay = hedge_min_delay
+        self.hedge_min_samples = hedge_min_samples
+        self._ttft = deque(maxlen=hedge_window)
+        for endpoint in self.endpoints:
+            endpoint._publish()
+
+    @property
+    def base_urls(self) -> List[str]:
+        return [endpoint.base_url for endpoint in self.endpoints]
+
+    def hedge_delay(self) -> Optional[float]:
+        """Seconds to wait for a first token before hedging, or None until enough samples exist."""
+        if len(self._ttft) < self.hedge_min_samples:
+            return None
+        samples = sorted(self._ttft)
+        index = min(len(samples) - 1, int(self.hedge_quantile * len(samples)))
+        return max(self.hedge_min_delay, samples[index])
+
+    def pick(self, exclude: Iterable[LLMEndpoint] = ()) -> Optional[LLMEndpoint]:
+        """Available endpoint with the fewest outstanding requests, or None."""
+        excluded = set(exclude)
+        candidates = [e for e in self.endpoints if e not in excluded and e.available()]
+        if not candidates:
+            return None
+        least = min(e.outstanding for e in candidates)
+        return random.choice([e for e in candidates if e.outstanding == least])
+
+    def call_timeout(self, deadline: Optional[float]) -> Tuple[Optional[float], bool]:
+        """Timeout for a call started now, and whether it is the caller's budget rather than `request_timeout`."""
+        if deadline is None:
+            return self.request_timeout, False
+        remaining = max(0.001, deadline - time.monotonic())
+        if self.request_timeout and self.request_timeout <= remaining:
+            return self.request_timeout, False
+        return remaining, True
+
+    async def astream(self, prompt: str, timeout: Optional[float] = None, hedge: bool = False) -> AsyncIterator[str]:
+        """
+        Stream a completion for `prompt` from the best endpoint.
+
+        Args:
+            prompt (str): Completion prompt
+            timeout (Optional[float]): Seconds the whole generation may take
+            hedge (bool): Allow a hedged duplicate (meant for short generations)
+
+        Raises:
+            LLMError: If no endpoint is available or all tried endpoints failed
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        endpoint, stream, first, budget_limited = await self._first_response(
+            prompt, deadline, hedge and self.hedging_enabled
+        )
+        outcome = "cancelled"
+        try:
+            yield first
+            async for chunk in stream:
+                yield _chunk_text(chunk)
+            outcome = "success"
+        except Exception as e:
+            outcome = classify_llm_error(e, budget_limited)
+            if outcome == "failure":
+                endpoint.on_failure()
+            raise
+        finally:
+            # Closing the HTTP response is what makes vLLM abort the generation
+            await stream.close()
+            endpoint.on_finish(outcome)
+
+    async def agenerate(self, prompt: str, timeout: Optional[float] = None, hedge: bool = False) -> str:
+        """Generate the full completion for `prompt`."""
+        return "".join([chunk async for chunk in self.astream(prompt, timeout=timeout, hedge=hedge)])
+
+    async def _open_stream(
+        self,
+        endpoint: LLMEndpoint,
+        prompt: str,
+        deadline: Optional[float]
+    ) -> Tuple[LLMEndpoint, openai.AsyncStream, str, bool]:
+        """Start a generation on `endpoint` and wait for its first chunk."""
+        endpoint.on_start()
+        timeout, budget_limited = self.call_timeout(deadline)
+        stream = None
+        try:
+            stream = await endpoint.client.completions.create(
+                model=config.LLM_MODEL_NAME,
+                prompt=prompt,
+                max_tokens=config.LLM_MAX_TOKENS,
+                temperature=config.LLM_TEMPERATURE,
+                stream=True,
+                timeout=timeout
+            )
+            first = _chunk_text(await stream.__anext__())
+        except StopAsyncIteration:
+            first = ""
+        except asyncio.CancelledError:
+            if stream is not None:
+                await stream.close()
+            endpoint.on_finish("cancelled")
+            raise
+        except Exception as e:
+            if stream is not None:
+                await stream.close()
+            outcome = classify_llm_error(e, budget_limited)
+            if outcome == "failure":
+                endpoint.on_failure()
+            endpoint.on_finish(outcome)
+            raise
+        endpoint.on_success()
+        return endpoint, stream, first, budget_limited
+
+    async def _discard(self, opened: Tuple[LLMEndpoint, openai.AsyncStream, str, bool]) -> None:
+        endpoint, stream = opened[:2]
+        await stream.close()
+        endpoint.on_finish("cancelled")
+
+    async def _first_response(
+        self,
+        prompt: str,
+        deadline: Optional[float],
+        hedge: bool
+    ) -> Tuple[LLMEndpoint, openai.AsyncStream, str, bool]:
+        """Race the primary (and, if slow, a hedge) to the first chunk, failing over on errors."""
+        started = time.monotonic()
+        hedge_delay = self.hedge_delay() if hedge else None
+        hedged = False
+        tried: Set[LLMEndpoint] = set()
+        pending: Set[asyncio.Task] = set()
+        owners = {}
+        last_error: Optional[BaseException] = None
+
+        def launch() -> bool:
+            endpoint = self.pick(exclude=tried)
+            if endpoint is None:
+                return False
+            tried.add(endpoint)
+            task = asyncio.ensure_future(self._open_stream(endpoint, prompt, deadline))
+            owners[task] = endpoint
+            pending.add(task)
+            return True
+
+        try:
+            while True:
+                if not pending:
+                    if deadline is not None and time.monotonic() >= deadline:
+                        raise LLMError("LLM request timed out") from last_error
+                    if not launch():
+                        message = f"All {len(tried)} LLM endpoint(s) tried failed" if tried else "No healthy LLM endpoint available"
+                        raise LLMError(message) from last_error
+
+                wait_timeout = None
+                if hedge_delay is not None and not hedged:
+                    wait_timeout = max(0.0, started + hedge_delay - time.monotonic())
+                done, pending = await asyncio.wait(pending, timeout=wait_timeout, return_when=asyncio.FIRST_COMPLETED)
+
+                if not done:
+                    hedged = True
+                    if launch():
+                        metrics.inc("llm_hedges_total", outcome="sent")
+                    continue
+
+                winner = None
+                for task in done:
+                    if task.exception() is not None:
+                        last_error = task.exception()
+                        logger.warning(f"LLM endpoint {owners[task].base_url} failed: {type(last_error).__name__}: {last_error}")
+                    elif winner is None:
+                        winner = task.result()
+                    else:
+                        await self._discard(task.result())
+                if winner is None:
+                    continue
+
+                self._ttft.append(time.monotonic() - started)
+                if hedged and len(tried) > 1:
+                    first_launched = next(iter(owners.values()))
+                    metrics.inc("llm_hedges_total", outcome="primary_won" if winner[0] is first_launched else "hedge_won")
+                return winner
+        finally:
+            for task in pending:
+                task.cancel()
+            if pending:
+                # A task can finish with an open stream between the wait and its cancellation
+                for result in await asyncio.gather(*pending, return_exceptions=True):
+                    if isinstance(result, tuple):
+                        await self._discard(result)
+
+
+_llm_router: Optional[LLMRouter] = None
+
+
+def get_llm_endpoints() -> List[str]:
+    """Configured LLM endpoints: LLM_API_BASES, or LLM_API_BASE alone."""
+    return list(config.LLM_API_BASES) or [config.LLM_API_BASE]
+
+
+def get_llm_router() -> LLMRouter:
+    """Returns the router for the configured endpoints, rebuilding it if the endpoint list changed."""
+    global _llm_router
+    endpoints = get_llm_endpoints()
+    if _llm_router is None or _llm_router.base_urls != endpoints:
+        logger.info(f"Initializing LLM router over {len(endpoints)} endpoint(s): {endpoints}")
+        _llm_router = LLMRouter(
+            endpoints,
+            failure_threshold=config.LLM_CIRCUIT_FAILURE_THRESHOLD,
+            reset_timeout=config.LLM_CIRCUIT_RESET_TIMEOUT,
+            request_timeout=config.LLM_REQUEST_TIMEOUT,
+            hedging_enabled=config.LLM_HEDGING_ENABLED,
+            hedge_quantile=config.LLM_HEDGE_QUANTILE,
+            hedge_min_delay=config.LLM_HEDGE_MIN_DELAY,
+            hedge_min_samples=config.LLM_HEDGE_MIN_SAMPLES,
+            hedge_window=config.LLM_HEDGE_WINDOW
+        )
+    return _llm_router
@@ -1,10 +1,10 @@
 # app/utils/milvus_utils.py
 import logging
-from typing import List
-from pymilvus import connections, db, Collection
+from typing import Any, Dict, Iterator, List
+from pymilvus import connections, db, utility, Collection
 from langchain_core.documents import Document
 from app.config.config import config
-from app.utils.embedding_utils import (get_dense_embedding_model)
+from app.utils.embedding_utils import RequestCachedQueryEmbeddings
 from langchain_milvus import Milvus, BM25BuiltInFunction
 import threading
 
@@ -15,7 +15,9 @@ _vector_store_lock = threading.Lock()
 _vector_store_instance = None
 
 def initialize_embeddings():
-    return get_dense_embedding_model()
+    # Queries go through the local encoder when enabled; document batches always use the remote embedder.
+    # Query vectors are shared within a request (see query_embedding_cache).
+    return RequestCachedQueryEmbeddings()
 
 def setup_milvus_database(db_name=config.MILVUS_DB_NAME) -> bool:
     """Setup Milvus database connection."""
@@ -56,6 +58,83 @@ def get_total_documents_in_collection(collection_name: str) -> int:
         logger.error(f"Error fetching document count for collection '{collection_name}': {e}")
         return -1
     
+def get_collection_field_names(collection_name: str = config.MILVUS_COLLECTION_NAME) -> List[str]:
+    """Return the names of all fields in a Milvus collection schema."""
+    collection = Collection(name=collection_name)
+    return [f.name for f in collection.schema.fields]
+
+# Chunk metadata the collection schema must hold. The collection has no dynamic field, so
+# fields added after it was created are silently dropped on insert.
+REQUIRED_METADATA_FIELDS = ["chunk_type", "faq_answer", config.CATEGORY_PARTITION_KEY_FIELD]
+
+def get_missing_metadata_fields(collection_name: str = config.MILVUS_COLLECTION_NAME) -> List[str]:
+    """
+    Return REQUIRED_METADATA_FIELDS absent from an existing collection's schema.
+
+    Empty if the collection does not exist yet (its schema is created from the
+    first insert) or cannot be inspected.
+    """
+    try:
+        if not utility.has_collection(collection_name):
+            return []
+        fields = get_collection_field_names(collection_name)
+    except Exception as e:
+        logger.warning(f"Could not inspect schema of collection '{collection_name}': {e}")
+        return []
+    return [name for name in REQUIRED_METADATA_FIELDS if name not in fields]
+
+def count_collection_entities(collection_name: str = config.MILVUS_COLLECTION_NAME) -> int:
+    """Return the exact number of entities in a collection via count(*)."""
+    collection = Collection(name=collection_name)
+    collection.load()
+    result = collection.query(expr="", output_fields=["count(*)"])
+    return int(result[0]["count(*)"]) if result else 0
+
+def iterate_collection(
+    collection_name: str = config.MILVUS_COLLECTION_NAME,
+    output_fields: List[str] = ["*"],
+    batch_size: int = 1000,
+    expr: str = ""
+) -> Iterator[List[Dict[str, Any]]]:
+    """Yield every entity of a Milvus collection in batches of `batch_size`."""
+    collection = Collection(name=collection_name)
+    collection.load()
+    iterator = collection.query_iterator(
+        batch_size=batch_size,
+        expr=expr,
+        output_fields=output_fields
+    )
+    try:
+        while True:
+            batch = iterator.next()
+            if not batch:
+                break
+            yield batch
+    finally:
+        iterator.close()
+
+def sample_dense_vectors_by_category(
+    collection_name: str = config.MILVUS_COLLECTION_NAME,
+    limit: int = config.CATEGORY_CENTROID_SAMPLE_SIZE
+) -> Dict[str, List[List[float]]]:
+    """Fetch up to `limit` stored dense vectors per category partition."""
+    vectors: Dict[str, List[List[float]]] = {}
+    try:
+        collection = Collection(name=collection_name)
+        collection.load()
+        key_field = config.CATEGORY_PARTITION_KEY_FIELD
+        for category in config.CATEGORIES:
+            rows = collection.query(
+                expr=f'{key_field} == "{category}"',
+                output_fields=["dense"],
+                limit=limit
+            )
+            if rows:
+                vectors[category] = [row["dense"] for row in rows]
+    except Exception as e:
+        logger.error(f"Error sampling dense vectors from collection '{collection_name}': {e}")
+    return vectors
+
 async def create_vector_store(
     documents: List[Document], 
     embeddings, 
@@ -83,6 +162,7 @@ async def create_vector_store(
                 "timeout": config.MILVUS_TIMEOUT
             },
             builtin_function=BM25BuiltInFunction(),
+            partition_key_field=config.CATEGORY_PARTITION_KEY_FIELD if config.CATEGORY_ROUTING_ENABLED else None,
             vector_field=["dense", "sparse"],
             consistency_level="Strong",
             index_params=config.MILVUS_INDEX_PARAMS,
@@ -137,6 +217,13 @@ async def index_document_chunks(documents: List[Document], collection_name: str
     if not documents:
         logger.warning("No document chunks provided for indexing.")
         return None
+
+    missing = get_missing_metadata_fields(collection_name)
+    if missing:
+        raise ValueError(
+            f"Collection '{collection_name}' predates the {missing} metadata fields and would silently drop them. "
+            f"Drop the collection and re-ingest all documents."
+        )
         
     try:
         # Get existing vector store instance
@@ -1,6 +1,24 @@
-PROMPT_TEMPLATE = """
-You are an expert assistant. Given a user question and context, answer it along with citations for each source. 
-Answer strictly in this JSON format: 
-{{"answer": "<string>", "category": "<api|security|pricing|support|other>", "confidence": <float 0-1>, "sources": [{{"doc": "<document_name>", "snippet": "<source_snippet>"}}]}}
-"Context: {context}\nUser Question: {question}\nJSON Output:"
-"""
\ No newline at end of file
+# Prompts are laid out for vLLM automatic prefix caching: a byte-stable static
+# prefix (instructions and schema, never interpolated), then the context chunks
+# in canonical order, then the question last. Requests therefore share the KV
+# cache for the prefix, and for context when they retrieve the same chunks.
+# The model never writes citations: sources are extracted from the retrieved
+# chunks after generation (app.rag.source_snippets), saving output tokens.
+
+PROMPT_PREFIX = """You are an expert assistant. Given a user question and context, answer it using only the context.
+Answer strictly in this JSON format:
+{"answer": "<string>", "category": "<api|security|pricing|support|other>", "confidence": <float 0-1>}
+"""
+
+# Used when the category router has already predicted the category with high confidence,
+# so the model does not spend output tokens on it.
+ROUTED_PROMPT_PREFIX = """You are an expert assistant. Given a user question and context, answer it using only the context.
+Answer strictly in this JSON format:
+{"answer": "<string>", "confidence": <float 0-1>}
+"""
+
+
+def build_prompt(context: str, question: str, routed: bool = False) -> str:
+    """Assemble the completion prompt: static prefix, then context, then the question."""
+    prefix = ROUTED_PROMPT_PREFIX if routed else PROMPT_PREFIX
+    return f"{prefix}\nContext:\n{context}\n\nUser Question: {question}\nJSON Output:"
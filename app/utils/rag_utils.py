@@ -4,19 +4,34 @@ from langchain_core.documents import Document
 
 logger = logging.getLogger(__name__)
 
-async def prepare_document_context(docs: List[Document]) -> str:
+def _canonical_sort_key(doc: Document):
+    metadata = doc.metadata.get('metadata', {}) if isinstance(doc.metadata.get('metadata'), dict) else doc.metadata
+    return (
+        metadata.get('document_name', ''),
+        metadata.get('section_name', ''),
+        metadata.get('heading', ''),
+        metadata.get('sub_heading', ''),
+        doc.page_content,
+    )
+
+async def prepare_document_context(docs: List[Document], canonical_order: bool = True) -> str:
     """
     Prepare document context for the LLM by formatting documents with metadata.
     Removes duplicate documents to reduce context size.
     
     Args:
         docs (List[Document]): List of documents to format
+        canonical_order (bool): Order chunks by document and section instead of by score,
+            so the same chunk set always yields byte-identical context (prefix-cache friendly)
         
     Returns:
         str: Formatted context string
     """
     if not docs:
         return ""
+
+    if canonical_order:
+        docs = sorted(docs, key=_canonical_sort_key)
         
     # Track seen contents to avoid duplicates
     seen_contents = set()
@@ -33,11 +48,11 @@ async def prepare_document_context(docs: List[Document]) -> str:
             seen_contents.add(content)
 
             context_part = (
-                f"document_name: {metadata.get('document_name', '')} \n"
-                f"section_name: {metadata.get('section_name', '')} \n"
-                f"heading: {metadata.get('heading', '')} \n"
-                f"sub_heading: {metadata.get('sub_heading', '')} \n"
-                f"page_content: {content} \n"
+                f"document_name: {metadata.get('document_name', '')}\n"
+                f"section_name: {metadata.get('section_name', '')}\n"
+                f"heading: {metadata.get('heading', '')}\n"
+                f"sub_heading: {metadata.get('sub_heading', '')}\n"
+                f"page_content: {content.strip()}\n"
             )
             context_parts.append(context_part)
             
@@ -0,0 +1,102 @@
+"""Ring buffer of slow requests with their stage timings and a stack sample"""
+import asyncio
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Dict, List, Optional, TypeVar
+
+from app.config.config import config
+from app.utils.metrics import metrics
+from app.utils.profiler import frame_label
+
+T = TypeVar("T")
+
+metrics.describe("slow_requests_total", "Requests slower than SLOW_REQUEST_THRESHOLD_MS, by endpoint")
+
+
+def coroutine_stack(task: asyncio.Task) -> List[str]:
+    """Where a task is suspended: its coroutine await chain, outermost first, ending at the awaited object."""
+    stack: List[str] = []
+    awaitable: Any = task.get_coro()
+    while awaitable is not None:
+        frame = getattr(awaitable, "cr_frame", None) or getattr(awaitable, "ag_frame", None) or getattr(awaitable, "gi_frame", None)
+        if frame is None:
+            stack.append(f"<awaiting {type(awaitable).__name__}>")
+            break
+        stack.append(frame_label(frame, line_numbers=True))
+        awaitable = getattr(awaitable, "cr_await", None) or getattr(awaitable, "ag_await", None) or getattr(awaitable, "gi_yieldfrom", None)
+    return stack
+
+
+class SlowRequestRecorder:
+    """
+    Keeps the last `capacity` requests that took longer than `threshold_ms`.
+
+    A request run through `watched` gets a timer on the event loop: if it is
+    still running at the threshold, the pipeline task's await chain is captured
+    along with how late the timer fired (a late timer means the loop itself was
+    blocked). `record` then stores the request if its total time crossed the
+    threshold.
+    """
+
+    def __init__(self, threshold_ms: float, capacity: int):
+        self.threshold_ms = threshold_ms
+        self._records: deque = deque(maxlen=capacity)
+        self._lock = threading.Lock()
+
+    async def watched(self, coro: Awaitable[T], trace: Dict[str, Any]) -> T:
+        """Await `coro`, sampling its stack into `trace` if it runs past the threshold."""
+        loop = asyncio.get_running_loop()
+        task = asyncio.current_task()
+        scheduled = time.perf_counter() + self.threshold_ms / 1000
+
+        def capture() -> None:
+            trace["stack_sample"] = {
+                "at_ms": self.threshold_ms,
+                "loop_lag_ms": round((time.perf_counter() - scheduled) * 1000, 1),
+                "stack": coroutine_stack(task),
+            }
+
+        handle = loop.call_later(self.threshold_ms / 1000, capture)
+        try:
+            return await coro
+        finally:
+            handle.cancel()
+
+    def record(self, endpoint: str, status: int, trace: Dict[str, Any], **details: Any) -> None:
+        """Store the request if trace["timings"]["total"] crossed the threshold."""
+        timings = trace.get("timings", {})
+        total_ms = timings.get("total", 0.0)
+        if total_ms < self.threshold_ms:
+            return
+        metrics.inc("slow_requests_total", endpoint=endpoint)
+        entry = {
+            "time": datetime.now(timezone.utc).isoformat(),
+            "endpoint": endpoint,
+            "status": status,
+            "total_ms": round(total_ms, 1),
+            "timings": {stage: round(value, 1) for stage, value in timings.items()},
+            "answer_path": trace.get("answer_path"),
+            "stack_sample": trace.get("stack_sample"),
+            **details,
+        }
+        with self._lock:
+            self._records.append(entry)
+
+    def records(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Recorded slow requests, newest first."""
+        with self._lock:
+            entries = list(reversed(self._records))
+        return entries[:limit] if limit else entries
+
+    def clear(self) -> None:
+        with self._lock:
+            self._records.clear()
+
+
+# Create a singleton recorder shared by the API handlers
+slow_requests = SlowRequestRecorder(
+    threshold_ms=config.SLOW_REQUEST_THRESHOLD_MS,
+    capacity=config.SLOW_REQUEST_BUFFER_SIZE,
+)
@@ -0,0 +1,40 @@
+"""Per-request stage timings, exported in the Server-Timing header"""
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator
+
+
+def record_timing(trace: Dict[str, Any], stage: str, started: float) -> None:
+    """Add milliseconds elapsed since `started` (time.perf_counter()) to trace["timings"][stage]."""
+    timings = trace.setdefault("timings", {})
+    timings[stage] = timings.get(stage, 0.0) + (time.perf_counter() - started) * 1000
+
+
+@contextmanager
+def stage_timer(trace: Dict[str, Any], stage: str) -> Iterator[None]:
+    """Time the enclosed block as `stage`; recorded even if the block raises or is cancelled."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_timing(trace, stage, started)
+
+
+def server_timing_header(timings: Dict[str, float]) -> str:
+    """Format stage timings as a Server-Timing header value (`name;dur=ms, ...`)."""
+    return ", ".join(f"{stage};dur={duration:.1f}" for stage, duration in timings.items())
+
+
+def parse_server_timing(header: str) -> Dict[str, float]:
+    """Inverse of server_timing_header; metrics without a duration are skipped."""
+    timings: Dict[str, float] = {}
+    for metric in header.split(","):
+        name, *params = [part.strip() for part in metric.split(";")]
+        for param in params:
+            key, _, value = param.partition("=")
+            if name and key == "dur":
+                try:
+                    timings[name] = float(value)
+                except ValueError:
+                    pass
+    return timings
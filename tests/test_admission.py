@@ -0,0 +1,170 @@
+"""Unit tests for AdmissionController (app/utils/admission.py)."""
+import asyncio
+import time
+
+import pytest
+
+from app.utils import admission
+from app.utils.admission import AdmissionController, AdmissionRejected, PRIORITY_LEVELS
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_waiters_are_served_in_priority_order():
+    async def run():
+        controller = AdmissionController("test", max_in_flight=1, max_queue=10, service_time=0.1)
+        served = []
+        release = asyncio.Event()
+
+        async def request(priority):
+            async with controller.slot(priority):
+                served.append(priority)
+                await release.wait()
+
+        holder = asyncio.create_task(request("normal"))
+        await asyncio.sleep(0)
+        waiters = [asyncio.create_task(request(priority)) for priority in ("low", "normal", "high")]
+        await asyncio.sleep(0)
+        assert controller.queue_depth == 3
+
+        release.set()
+        await asyncio.gather(holder, *waiters)
+        return served, controller
+
+    served, controller = asyncio.run(run())
+    assert served == ["normal", "high", "normal", "low"]
+    assert controller.in_flight == 0 and controller.queue_depth == 0
+
+
+def test_service_time_is_an_ewma_of_slot_hold_time(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(admission.time, "monotonic", clock)
+
+    async def run():
+        controller = AdmissionController("test", max_in_flight=1, max_queue=10, service_time=1.0)
+        async with controller.slot():
+            clock.now += 2.0
+        return controller
+
+    controller = asyncio.run(run())
+    assert controller._service_time == pytest.approx(0.8 * 1.0 + 0.2 * 2.0)
+
+
+def test_estimated_wait_counts_waiters_at_or_above_the_level():
+    async def run():
+        controller = AdmissionController("test", max_in_flight=2, max_queue=10, service_time=0.5)
+        assert controller.estimate_wait(PRIORITY_LEVELS["normal"]) == 0.0
+
+        release = asyncio.Event()
+
+        async def request(priority):
+            async with controller.slot(priority):
+                await release.wait()
+
+        tasks = [asyncio.create_task(request("normal")) for _ in range(2)]
+        tasks += [asyncio.create_task(request(priority)) for priority in ("high", "normal", "normal", "low")]
+        await asyncio.sleep(0)
+        estimates = {name: controller.estimate_wait(level) for name, level in PRIORITY_LEVELS.items()}
+        release.set()
+        await asyncio.gather(*tasks)
+        return estimates
+
+    estimates = asyncio.run(run())
+    # Each level waits behind the waiters at its own or higher priority, two slots per round
+    assert estimates == {"high": 0.5, "normal": 1.0, "low": 1.5}
+
+
+def test_full_queue_is_shed_with_retry_after():
+    async def run():
+        controller = AdmissionController("test", max_in_flight=1, max_queue=1, service_time=2.5)
+        release = asyncio.Event()
+
+        async def request():
+            async with controller.slot():
+                await release.wait()
+
+        tasks = [asyncio.create_task(request()) for _ in range(2)]
+        await asyncio.sleep(0)
+        with pytest.raises(AdmissionRejected) as rejected:
+            async with controller.slot():
+                pass
+        release.set()
+        await asyncio.gather(*tasks)
+        return rejected.value
+
+    rejected = asyncio.run(run())
+    assert rejected.reason == "queue_full"
+    assert rejected.retry_after_header == "5"
+
+
+def test_request_whose_estimated_wait_overruns_its_deadline_is_shed_immediately():
+    async def run():
+        controller = AdmissionController("test", max_in_flight=1, max_queue=10, service_time=5.0)
+        async with controller.slot():
+            with pytest.raises(AdmissionRejected) as rejected:
+                async with controller.slot(deadline=time.monotonic() + 1.0):
+                    pass
+            assert controller.queue_depth == 0
+        return rejected.value, controller
+
+    rejected, controller = asyncio.run(run())
+    assert rejected.reason == "deadline"
+    assert controller.in_flight == 0
+
+
+def test_deadline_passing_in_queue_sheds_and_leaves_no_waiter():
+    async def run():
+        controller = AdmissionController("test", max_in_flight=1, max_queue=10, service_time=0.01)
+        async with controller.slot():
+            with pytest.raises(AdmissionRejected) as rejected:
+                async with controller.slot(deadline=time.monotonic() + 0.05):
+                    pass
+            assert controller.queue_depth == 0
+        return rejected.value, controller
+
+    rejected, controller = asyncio.run(run())
+    assert rejected.reason == "deadline"
+    assert controller.in_flight == 0
+
+
+def test_slot_handed_over_as_the_wait_times_out_is_released(monkeypatch):
+    async def run():
+        controller = AdmissionController("test", max_in_flight=1, max_queue=10, service_time=0.01)
+        await controller._acquire(PRIORITY_LEVELS["normal"], None)
+
+        async def wait_for_racing_release(future, timeout):
+            # The holder finishes and hands its slot to this waiter just as the timeout fires
+            controller._release()
+            assert future.done()
+            raise asyncio.TimeoutError
+
+        monkeypatch.setattr(admission.asyncio, "wait_for", wait_for_racing_release)
+        with pytest.raises(AdmissionRejected):
+            await controller._acquire(PRIORITY_LEVELS["normal"], time.monotonic() + 10.0)
+        return controller
+
+    controller = asyncio.run(run())
+    assert controller.in_flight == 0
+    assert controller.queue_depth == 0
+
+
+def test_cancelled_waiter_leaves_the_queue():
+    async def run():
+        controller = AdmissionController("test", max_in_flight=1, max_queue=10, service_time=0.01)
+        async with controller.slot():
+            waiter = asyncio.create_task(controller._acquire(PRIORITY_LEVELS["normal"], None))
+            await asyncio.sleep(0)
+            assert controller.queue_depth == 1
+            waiter.cancel()
+            await asyncio.gather(waiter, return_exceptions=True)
+            assert controller.queue_depth == 0
+        return controller
+
+    controller = asyncio.run(run())
+    assert controller.in_flight == 0
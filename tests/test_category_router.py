@@ -0,0 +1,69 @@
+"""Unit tests for centroid-based category routing (app/rag/category_router.py)."""
+import asyncio
+import time
+
+import numpy as np
+import pytest
+
+from app.config.config import config
+from app.rag import category_router
+from app.rag.category_router import classify_question
+
+LABELS = ["api", "security", "pricing", "support"]
+
+
+@pytest.fixture
+def routing(monkeypatch):
+    """Fixed one-hot centroids and the default routing thresholds."""
+    monkeypatch.setattr(config, "CATEGORY_ROUTING_ENABLED", True)
+    monkeypatch.setattr(config, "CATEGORY_ROUTING_MIN_CONFIDENCE", 0.6)
+    monkeypatch.setattr(config, "CATEGORY_ROUTING_TEMPERATURE", 0.05)
+    monkeypatch.setattr(config, "CATEGORY_ROUTING_MAX_PARTITIONS", 2)
+    monkeypatch.setattr(category_router, "_centroids", np.eye(len(LABELS), dtype=np.float32))
+    monkeypatch.setattr(category_router, "_centroid_labels", list(LABELS))
+
+    scheduled = []
+    monkeypatch.setattr(category_router, "schedule_centroid_build", lambda: scheduled.append(True))
+    return scheduled
+
+
+def _classify(query_vector):
+    return asyncio.run(classify_question("question", query_vector=query_vector))
+
+
+def test_confident_question_is_routed_to_one_partition(routing):
+    prediction = _classify([0.0, 2.0, 0.0, 0.0])
+    assert prediction.category == "security"
+    assert prediction.confidence > 0.99
+    assert prediction.partitions == ["security"]
+    assert prediction.expr == f'{config.CATEGORY_PARTITION_KEY_FIELD} in ["security"]'
+
+
+def test_question_between_two_categories_searches_both(routing):
+    prediction = _classify([1.0, 1.0, 0.0, 0.0])
+    assert set(prediction.partitions) == {"api", "security"}
+    assert prediction.confidence == pytest.approx(0.5, abs=1e-3)
+
+
+def test_ambiguous_question_falls_back_to_global_search(routing):
+    # Four equally likely categories: two partitions only cover half the probability
+    prediction = _classify([1.0, 1.0, 1.0, 1.0])
+    assert prediction.partitions == []
+    assert prediction.expr is None
+    assert sum(prediction.scores.values()) == pytest.approx(1.0)
+
+
+def test_routing_disabled_returns_none(routing, monkeypatch):
+    monkeypatch.setattr(config, "CATEGORY_ROUTING_ENABLED", False)
+    assert _classify([1.0, 0.0, 0.0, 0.0]) is None
+
+
+def test_missing_centroids_schedule_a_build_unless_backing_off(routing, monkeypatch):
+    monkeypatch.setattr(category_router, "_centroids", None)
+    monkeypatch.setattr(category_router, "_retry_at", 0.0)
+    assert _classify([1.0, 0.0, 0.0, 0.0]) is None
+    assert routing == [True]
+
+    monkeypatch.setattr(category_router, "_retry_at", time.monotonic() + 60)
+    assert _classify([1.0, 0.0, 0.0, 0.0]) is None
+    assert routing == [True]
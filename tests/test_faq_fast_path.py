@@ -0,0 +1,46 @@
+"""Unit tests for the FAQ fast path gate (app/rag/faq_fast_path.py)."""
+import asyncio
+
+from langchain_core.documents import Document
+
+from app.rag.faq_fast_path import match_faq_answer, max_fused_score
+from app.utils.embedding_utils import query_embedding_cache
+
+QUESTION = "Does PiHex store prompts and outputs?"
+
+
+def _docs(top_rank_score: float = 1.0):
+    scale = max_fused_score("rrf", {"k": 60})
+    return [
+        Document(
+            page_content=f"{QUESTION}\nNo, prompts and outputs are not stored.",
+            metadata={"chunk_type": "faq", "faq_answer": "No, prompts and outputs are not stored.",
+                      "document_name": "support_faq.md", "category": "support", "distance": top_rank_score * scale},
+        ),
+        Document(page_content="Other section", metadata={"chunk_type": "section", "distance": 2 / 63}),
+    ]
+
+
+def _match(docs, query_vector, faq_question_vector):
+    async def run():
+        # The FAQ question's embedding comes from the per-request cache, so no embedder is needed
+        with query_embedding_cache({QUESTION: faq_question_vector}):
+            return await match_faq_answer(docs, query_vector, ranker_type="rrf", ranker_params={"k": 60})
+    return asyncio.run(run())
+
+
+def test_semantically_matching_top_faq_is_answered_without_llm():
+    answer = _match(_docs(), [1.0, 0.0], [0.99, 0.05])
+    assert answer is not None
+    assert answer.answer == "No, prompts and outputs are not stored."
+    assert answer.sources[0].doc == "support_faq.md"
+
+
+def test_rank_agreement_alone_is_not_enough():
+    # Ranked first by both legs, but the FAQ question means something else
+    assert _match(_docs(), [1.0, 0.0], [0.0, 1.0]) is None
+
+
+def test_faq_ranked_low_by_one_leg_is_skipped():
+    # Fifth in one leg gives 1/61 + 1/65, below FAQ_FAST_PATH_MIN_SCORE of the 2/61 maximum
+    assert _match(_docs(top_rank_score=(1 / 61 + 1 / 65) / (2 / 61)), [1.0, 0.0], [1.0, 0.0]) is None
@@ -0,0 +1,87 @@
+"""Round-trip tests for vector index snapshots (app/tools/snapshot.py)."""
+import asyncio
+import sys
+
+import numpy as np
+import pytest
+
+from app.config.config import config
+from app.tools import snapshot
+from app.tools.snapshot import ChunkWriter, export_snapshot, import_snapshot, iterate_chunks, load_manifest
+
+ROWS = [
+    {"pk": str(i), "text": f"Chunk {i} about rate limits.", "dense": [float(i), 0.5, -1.0 / (i + 1)],
+     "document_name": f"doc_{i % 2}.md", "category": "api"}
+    for i in range(5)
+]
+
+
+class FakeVectorStore:
+    auto_id = False
+
+    def __init__(self):
+        self.texts, self.embeddings, self.metadatas, self.ids = [], [], [], []
+
+    def add_embeddings(self, texts, embeddings, metadatas, batch_size, ids=None):
+        self.texts += texts
+        self.embeddings += embeddings
+        self.metadatas += metadatas
+        self.ids += ids or []
+
+
+@pytest.fixture(params=["parquet", "jsonl"])
+def collection(request, monkeypatch):
+    """A fake two-batch collection; the jsonl variant hides pyarrow."""
+    if request.param == "jsonl":
+        monkeypatch.setitem(sys.modules, "pyarrow", None)
+    monkeypatch.setattr(config, "EMBEDDING_MODEL_NAME", "test-embedder")
+    monkeypatch.setattr(snapshot, "count_collection_entities", lambda name: len(ROWS))
+    monkeypatch.setattr(snapshot, "get_collection_field_names",
+                        lambda name: ["pk", "text", "dense", "sparse", "document_name", "category"])
+    monkeypatch.setattr(snapshot, "iterate_collection",
+                        lambda name, output_fields, batch_size: iter([ROWS[:3], ROWS[3:]]))
+    return request.param
+
+
+def test_export_import_round_trip(collection, tmp_path):
+    snapshot_dir = export_snapshot(str(tmp_path), batch_size=3)
+    manifest = load_manifest(snapshot_dir)
+    assert manifest["chunks_format"] == collection
+    assert (manifest["count"], manifest["dimension"]) == (5, 3)
+    assert manifest["metadata_fields"] == ["document_name", "category"]
+
+    store = FakeVectorStore()
+    assert asyncio.run(import_snapshot(snapshot_dir, batch_size=2, vector_store=store)) == 5
+    assert store.texts == [row["text"] for row in ROWS]
+    assert store.ids == [row["pk"] for row in ROWS]
+    assert store.metadatas == [{"document_name": row["document_name"], "category": "api"} for row in ROWS]
+    np.testing.assert_allclose(store.embeddings, [row["dense"] for row in ROWS], rtol=1e-6)
+
+
+def test_float16_export_keeps_vectors_close(collection, tmp_path):
+    snapshot_dir = export_snapshot(str(tmp_path), dtype="float16")
+    store = FakeVectorStore()
+    asyncio.run(import_snapshot(snapshot_dir, vector_store=store))
+    np.testing.assert_allclose(store.embeddings, [row["dense"] for row in ROWS], rtol=1e-3)
+
+
+def test_tampered_chunk_fails_hash_verification(collection, tmp_path):
+    snapshot_dir = export_snapshot(str(tmp_path))
+    manifest = load_manifest(snapshot_dir)
+    rows = [row for batch in iterate_chunks(snapshot_dir, manifest, batch_size=100) for row in batch]
+    rows[2]["text"] = "Chunk 2 about something else."
+    writer = ChunkWriter(snapshot_dir)
+    writer.write(rows)
+    writer.close()
+
+    store = FakeVectorStore()
+    with pytest.raises(ValueError, match="Chunk hash mismatch for id 2"):
+        asyncio.run(import_snapshot(snapshot_dir, vector_store=store))
+
+
+def test_import_refuses_a_different_embedding_model(collection, tmp_path, monkeypatch):
+    snapshot_dir = export_snapshot(str(tmp_path))
+    monkeypatch.setattr(config, "EMBEDDING_MODEL_NAME", "other-embedder")
+    with pytest.raises(ValueError, match="test-embedder"):
+        asyncio.run(import_snapshot(snapshot_dir, vector_store=FakeVectorStore()))
+    assert asyncio.run(import_snapshot(snapshot_dir, force=True, vector_store=FakeVectorStore())) == 5
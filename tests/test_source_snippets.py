@@ -0,0 +1,48 @@
+"""Unit tests for extractive source citations (app/rag/source_snippets.py)."""
+from langchain_core.documents import Document
+
+from app.rag.source_snippets import build_sources
+
+DOCS = [
+    Document(
+        page_content="Rate limits apply per API key. The default limit is 600 requests per minute. "
+                     "Exceeding it returns HTTP 429.",
+        metadata={"document_name": "api_reference.md"},
+    ),
+    Document(
+        page_content="Prompts and outputs are never stored. All traffic is encrypted with TLS 1.3.",
+        metadata={"document_name": "security_overview.md"},
+    ),
+    Document(
+        page_content="The Pro plan costs 49 dollars monthly.",
+        metadata={"document_name": "pricing.md"},
+    ),
+]
+
+
+def test_best_matching_window_of_each_related_chunk_is_cited():
+    sources = build_sources("Each API key may send 600 requests per minute.", DOCS, window_size=1)
+    assert [source.doc for source in sources] == ["api_reference.md"]
+    assert sources[0].snippet == "The default limit is 600 requests per minute."
+
+
+def test_sources_are_ordered_by_similarity_and_deduplicated():
+    answer = "Traffic is encrypted with TLS 1.3; each key gets 600 requests per minute."
+    sources = build_sources(answer, DOCS + [DOCS[1]], window_size=1)
+    assert [source.doc for source in sources] == ["security_overview.md", "api_reference.md"]
+    assert sources[0].snippet == "All traffic is encrypted with TLS 1.3."
+
+
+def test_unrelated_answer_cites_the_top_retrieved_chunk():
+    sources = build_sources("Zebras.", DOCS, window_size=1)
+    assert [source.doc for source in sources] == ["api_reference.md"]
+
+
+def test_empty_answer_cites_nothing():
+    assert build_sources("", DOCS) == []
+    assert build_sources("  \n", DOCS) == []
+
+
+def test_long_snippets_are_truncated_at_a_word_boundary():
+    sources = build_sources("Rate limits per API key.", DOCS, window_size=3, max_chars=30)
+    assert sources[0].snippet == "Rate limits apply per API..."
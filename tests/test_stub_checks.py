@@ -0,0 +1,33 @@
+"""
+Run the stub-backend checks (app/tools/check_*.py) under pytest.
+
+Each check starts local stub vLLM/embedding servers and an in-memory vector
+store, so no Milvus or GPU is needed.
+"""
+import asyncio
+
+from app.config.config import config
+from app.tools import check_cancellation, check_llm_routing
+
+
+def test_cancellation_frees_llm_slots():
+    before = (config.LLM_API_BASE, config.LLM_API_BASES, config.FAQ_FAST_PATH_ENABLED)
+    assert asyncio.run(check_cancellation.check(check_cancellation.parse_args([])))
+    # The check installs stubs and flips config flags; none of it may leak into later tests
+    assert (config.LLM_API_BASE, config.LLM_API_BASES, config.FAQ_FAST_PATH_ENABLED) == before
+
+
+def test_llm_routing_balancing():
+    assert asyncio.run(check_llm_routing.check(check_llm_routing.parse_args(["--scenarios", "balancing"])))
+
+
+def test_llm_routing_breaker():
+    assert asyncio.run(check_llm_routing.check(check_llm_routing.parse_args(["--scenarios", "breaker"])))
+
+
+def test_llm_routing_hedging():
+    assert asyncio.run(check_llm_routing.check(check_llm_routing.parse_args(["--scenarios", "hedging"])))
+
+
+def test_llm_routing_client_deadlines_keep_breakers_closed():
+    assert asyncio.run(check_llm_routing.check(check_llm_routing.parse_args(["--scenarios", "deadlines"])))